@@ -0,0 +1,122 @@
+"""Evaluation of expressions and models, packing of parameters and code generation"""
+
+from __future__ import annotations
+
+import numpy as np
+import sympy as sp
+
+from smitfit.cache import disable_cache
+from smitfit.expr import SympyExpr, SympyMatrixExpr
+from smitfit.model import Model
+from smitfit.parameter import PackingPlan, pack, unpack
+from smitfit.symbol import Symbols
+
+SIZES = [10, 1_000, 100_000]
+
+
+class SympyExprSuite:
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        s = Symbols("x a b c")
+        self.expr = SympyExpr(s.a * sp.exp(-s.b * s.x) + s.c * sp.sin(s.x) ** 2)  # type: ignore
+        self.kwargs = {"x": np.linspace(0, 10, n), "a": 2.0, "b": 0.5, "c": 1.5}
+        self.expr(**self.kwargs)
+
+    def time_call(self, n):
+        self.expr(**self.kwargs)
+
+    def time_call_positional(self, n):
+        self.expr.call_positional(*(self.kwargs[s.name] for s in self.expr.arg_symbols))
+
+
+class SympyMatrixExprSuite:
+    params = ([3, 10], SIZES)
+    param_names = ["size", "n"]
+
+    def setup(self, size, n):
+        x = sp.Symbol("x")
+        k = sp.symbols(f"k:{size}")
+        matrix = sp.Matrix(size, size, lambda i, j: k[i] * x**j if i != j else -k[i])
+        self.expr = SympyMatrixExpr(matrix)
+        self.kwargs = {"x": np.linspace(0, 1, n)} | {s.name: 1.0 + i for i, s in enumerate(k)}
+        self.expr(**self.kwargs)
+
+    def time_call(self, size, n):
+        self.expr(**self.kwargs)
+
+
+class ModelSuite:
+    """Overhead of `Model.__call__` over a direct evaluation of its expressions"""
+
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        s = Symbols("x y z a b")
+        self.model = Model({s.y: s.a * s.x + s.b, s.z: s.y**2 + s.a})  # type: ignore
+        self.kwargs = {"x": np.linspace(0, 10, n), "a": 2.0, "b": 0.5}
+        self.bound = self.model.bind(["a", "b"], x=self.kwargs["x"])
+        self.model(**self.kwargs)
+        self.bound(2.0, 0.5)
+
+    def time_call(self, n):
+        self.model(**self.kwargs)
+
+    def time_bound_call(self, n):
+        self.bound(2.0, 0.5)
+
+
+class PackSuite:
+    params = ([2, 20, 200], [(), (3, 1)])
+    param_names = ["n_parameters", "shape"]
+
+    def setup(self, n_parameters, shape):
+        self.values = {f"p{i}": np.full(shape, float(i)) for i in range(n_parameters)}
+        self.shapes = {k: v.shape for k, v in self.values.items()}
+        self.plan = PackingPlan(self.shapes)
+        self.x = pack(self.values.values())
+
+    def time_pack(self, n_parameters, shape):
+        pack(self.values.values())
+
+    def time_unpack(self, n_parameters, shape):
+        unpack(self.x, self.shapes)
+
+    def time_plan_pack(self, n_parameters, shape):
+        self.plan.pack(self.values)
+
+    def time_plan_unpack(self, n_parameters, shape):
+        self.plan.unpack(self.x)
+
+
+class LambdifySuite:
+    """Code generation and compilation, with the on-disk cache disabled"""
+
+    params = [1, 10, 25]
+    param_names = ["n_terms"]
+
+    def setup(self, n_terms):
+        disable_cache()
+        x = sp.Symbol("x")
+        a = sp.symbols(f"a:{n_terms}")
+        b = sp.symbols(f"b:{n_terms}")
+        self.scalar = sum(ai * sp.exp(-bi * x) for ai, bi in zip(a, b))
+        self.parameters = a + b
+        self.matrix = sp.Matrix(
+            n_terms, n_terms, lambda i, j: a[i] * sp.exp(-b[j] * x) if i != j else -a[i]
+        )
+
+    def time_lambdify_expr(self, n_terms):
+        SympyExpr(self.scalar).lambdified
+
+    def time_lambdify_matrix(self, n_terms):
+        SympyMatrixExpr(self.matrix).lambdified
+
+    def time_model_jacobian(self, n_terms):
+        model = Model({sp.Symbol("y"): self.scalar})
+        jacobian = model.jacobian(self.parameters)
+        for derivatives in jacobian.expr.values():
+            for d in derivatives.values():
+                d.lambdified  # type: ignore
@@ -0,0 +1,92 @@
+"""Fitting and bootstrapping"""
+
+from __future__ import annotations
+
+from smitfit.curve_fit import CurveFit
+from smitfit.error import Bootstrap, bootstrap
+from smitfit.function import Function
+from smitfit.least_squares import LeastSquares
+from smitfit.loss import MSELoss, SELoss
+from smitfit.minimize import Minimize
+
+from .common import line_data, line_model
+
+SIZES = [100, 10_000]
+
+
+class MinimizeSuite:
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        model = line_model()
+        self.xdata, self.ydata = line_data(n)
+        parameters = model.define_parameters("a b")
+        self.objective = Minimize(MSELoss(model, self.ydata), parameters, self.xdata)
+        self.objective.fit()
+
+    def time_fit(self, n):
+        self.objective.fit()
+
+
+class LeastSquaresSuite:
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        model = line_model()
+        self.xdata, self.ydata = line_data(n)
+        parameters = model.define_parameters("a b")
+        self.objective = LeastSquares(SELoss(model, self.ydata), parameters, self.xdata)
+        self.objective.fit()
+
+    def time_fit(self, n):
+        self.objective.fit()
+
+
+class CurveFitSuite:
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        f = Function("a*x + b")
+        self.xdata, self.ydata = line_data(n)
+        parameters = f.define_parameters("a b")
+        self.objective = CurveFit(f, parameters, self.xdata, self.ydata)
+        self.objective.fit()
+
+    def time_fit(self, n):
+        self.objective.fit()
+
+
+class BootstrapSuite:
+    params = ["function", "serial", "thread"]
+    param_names = ["executor"]
+    timeout = 120.0
+
+    n_boot = 20
+
+    def setup(self, executor):
+        self.model = line_model()
+        self.xdata, self.ydata = line_data(100)
+        self.parameters = self.model.define_parameters("a b")
+        self.loss = SELoss(self.model, self.ydata)
+        self.result = Minimize(self.loss, self.parameters, self.xdata).fit()
+
+    def fit(self, ydata):
+        return Minimize(SELoss(self.model, ydata), self.parameters, self.xdata).fit()
+
+    def time_bootstrap(self, executor):
+        if executor == "function":
+            bootstrap(self.fit, err=0.5, ydata=self.ydata, n_boot=self.n_boot)
+        else:
+            Bootstrap(
+                self.loss,
+                self.parameters,
+                self.xdata,
+                self.result,
+                err=0.5,
+                n_boot=self.n_boot,
+                executor=executor,
+                seed=0,
+            ).fit()
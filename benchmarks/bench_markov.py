@@ -0,0 +1,111 @@
+"""Numerical solutions of markov chains"""
+
+from __future__ import annotations
+
+import numpy as np
+import sympy as sp
+
+from smitfit.composite_expr import MarkovIVP
+from smitfit.loss import MSELoss
+from smitfit.markov import TransitionTemplate, extract_states, generate_transition_matrix
+from smitfit.minimize import Minimize
+from smitfit.model import Model
+from smitfit.symbol import symbol_matrix
+
+from .common import chain_connectivity, markov_model
+
+
+class MarkovIVPSuite:
+    params = ([3, 10, 50], [50, 500], ["ivp", "eig", "expm"])
+    param_names = ["n_states", "n_times", "solver"]
+
+    def setup(self, n_states, n_times, solver):
+        self.model, self.values = markov_model(n_states, solver=solver)
+        self.xdata = {"t": np.linspace(0, 11, num=n_times)}
+        self.model(**self.values, **self.xdata)
+
+    def time_solve(self, n_states, n_times, solver):
+        self.model(**self.values, **self.xdata)
+
+
+class BatchedMarkovIVPSuite:
+    """Batches of rate constants solved in a single call, or one call per batch element"""
+
+    params = ([1, 10, 100], ["ivp", "eig", "expm"])
+    param_names = ["batch_size", "solver"]
+    timeout = 120.0
+
+    def setup(self, batch_size, solver):
+        self.model, values = markov_model(10, solver=solver)
+        scale = np.linspace(0.5, 1.5, num=batch_size)
+        self.batch = {k: v * scale if k.startswith("k") else v for k, v in values.items()}
+        self.xdata = {"t": np.linspace(0, 11, num=100)}
+        self.model(**self.batch, **self.xdata)
+
+    def time_batched(self, batch_size, solver):
+        self.model(**self.batch, **self.xdata)
+
+    def time_loop(self, batch_size, solver):
+        for i in range(batch_size):
+            values = {k: v[i] if np.ndim(v) else v for k, v in self.batch.items()}
+            self.model(**values, **self.xdata)
+
+
+class MarkovFitSuite:
+    timeout = 120.0
+
+    def setup(self):
+        self.model, values = markov_model(3)
+        self.xdata = {"t": np.linspace(0, 11, num=50)}
+        rng = np.random.default_rng(43)
+        y = self.model(**values, **self.xdata)["y"]
+        ydata = {"y": y + rng.normal(0, 0.05, size=y.shape)}
+
+        parameters = self.model.define_parameters("k*") + self.model.define_parameters("y0*")
+        self.objective = Minimize(MSELoss(self.model, ydata), parameters, self.xdata)
+
+    def time_fit(self):
+        self.objective.fit()
+
+
+class TransitionMatrixSuite:
+    """Scaling of parsing reaction equations and building transition rate matrices, for a chain
+    of `n_states` states given as one equation per reaction"""
+
+    params = ([100, 1_000, 10_000], ["dense", "sparse", "template"])
+    param_names = ["n_states", "output"]
+    timeout = 120.0
+
+    def setup(self, n_states, output):
+        if output == "dense" and n_states > 1_000:
+            raise NotImplementedError("dense matrix of this size is not benchmarked")
+        self.connectivity = [f"S{i} <-> S{i + 1}" for i in range(n_states - 1)]
+
+    def time_generate_transition_matrix(self, n_states, output):
+        if output == "template":
+            TransitionTemplate(self.connectivity)
+        else:
+            generate_transition_matrix(self.connectivity, sparse=output == "sparse")
+
+    def time_extract_states(self, n_states, output):
+        extract_states(self.connectivity)
+
+
+class SparseMarkovIVPSuite:
+    params = ([100, 1_000], ["ivp", "expm"])
+    param_names = ["n_states", "solver"]
+    timeout = 120.0
+
+    def setup(self, n_states, solver):
+        connectivity = chain_connectivity(n_states)
+        template = TransitionTemplate(connectivity)
+        y0 = symbol_matrix(name="y0", shape=(n_states, 1), suffix=template.states)
+        self.model = Model({sp.Symbol("y"): MarkovIVP(sp.Symbol("t"), template, y0, solver=solver)})
+
+        self.values = {s.name: 1.0 for s in template.rates} | {s.name: 0.0 for s in y0}
+        self.values[y0[0].name] = 1.0
+        self.xdata = {"t": np.linspace(0, 11, num=100)}
+        self.model(**self.values, **self.xdata)
+
+    def time_solve(self, n_states, solver):
+        self.model(**self.values, **self.xdata)
@@ -0,0 +1,30 @@
+"""Root finding (see `examples/find_root.py`)"""
+
+from __future__ import annotations
+
+import numpy as np
+from scipy.optimize import fsolve
+
+from smitfit.root import Root
+
+
+def hand_written(x, a1, a2, b):
+    return [x[0] * np.cos(x[1]) - a1, x[1] * x[0] - b * x[1] - a2]
+
+
+class RootSuite:
+    def setup(self):
+        self.root = Root(["x0*cos(x1) == a1", "x1*x0 - b*x1 == a2"])
+        self.root.set_x0({"x0": 1.0, "x1": 1.0})
+        self.root.set_args({"a1": 4.0, "a2": 5, "b": 1.0})
+        self.func = self.root.func
+        self.func(self.root.x0, *self.root.args)
+
+    def time_func(self):
+        self.func(self.root.x0, *self.root.args)
+
+    def time_fsolve(self):
+        fsolve(self.func, self.root.x0, self.root.args)
+
+    def time_fsolve_hand_written(self):
+        fsolve(hand_written, self.root.x0, self.root.args)
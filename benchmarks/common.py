@@ -0,0 +1,46 @@
+"""Models and data shared by the benchmarks"""
+
+from __future__ import annotations
+
+import numpy as np
+import sympy as sp
+
+from smitfit.composite_expr import MarkovIVP
+from smitfit.markov import extract_states, generate_transition_matrix
+from smitfit.model import Model
+from smitfit.symbol import Symbols, symbol_matrix
+
+
+def line_data(n: int, seed: int = 43) -> tuple[dict[str, np.ndarray], dict[str, np.ndarray]]:
+    """x and y data of a noisy line with `n` points"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 11, num=n)
+    y = 0.15 * x + 2.5
+    return {"x": x}, {"y": y + rng.normal(0, scale=y / 10.0 + 0.2)}
+
+
+def line_model() -> Model:
+    s = Symbols("x y a b")
+    return Model({s.y: s.a * s.x + s.b})  # type: ignore
+
+
+def chain_connectivity(n_states: int) -> list[str]:
+    """Connectivity of a linear chain of reversible transitions between `n_states` states"""
+    states = [f"S{i}" for i in range(n_states)]
+    return [" <-> ".join(states)]
+
+
+def markov_model(n_states: int, **kwargs) -> tuple[Model, dict[str, float]]:
+    """`MarkovIVP` model of a linear chain and parameter values, with all population in the first
+    state at t = 0. Keyword arguments are passed to `MarkovIVP`."""
+    connectivity = chain_connectivity(n_states)
+    m = generate_transition_matrix(connectivity)
+    states = extract_states(connectivity)
+    y0 = symbol_matrix(name="y0", shape=(n_states, 1), suffix=states)
+    model = Model({sp.Symbol("y"): MarkovIVP(sp.Symbol("t"), m, y0, **kwargs)})
+
+    values = {s.name: 1.0 / (1 + i) for i, s in enumerate(sorted(m.free_symbols, key=str))}
+    values |= {s.name: 0.0 for s in y0}
+    values[y0[0].name] = 1.0
+
+    return model, values
@@ -1,23 +1,31 @@
 from smitfit.curve_fit import CurveFit
 from smitfit.expr import CustomFunction
 from smitfit.function import Function
+from smitfit.least_squares import LeastSquares
+from smitfit.linear import LinearLeastSquares
 from smitfit.loss import SELoss
 from smitfit.minimize import Minimize
 from smitfit.model import Model
+from smitfit.multistart import MultiStart
 from smitfit.parameter import Parameter, Parameters
 from smitfit.result import Result
 from smitfit.symbol import Symbols
+from smitfit.varpro import VarPro
 from smitfit.__version__ import __version__  # noqa: F401
 
 __all__ = [
     "CurveFit",
     "CustomFunction",
     "Function",
+    "LeastSquares",
+    "LinearLeastSquares",
     "SELoss",
     "Minimize",
     "Model",
+    "MultiStart",
     "Parameter",
     "Parameters",
     "Result",
     "Symbols",
+    "VarPro",
 ]
@@ -0,0 +1,168 @@
+"""Opt-in persistent on-disk cache of generated source code.
+
+When enabled, source code generated by `smitfit.codegen` is stored in a cache directory keyed by
+a hash of the sympy expressions and argument order, such that new processes can compile the
+generated functions without invoking sympy's code printer again.
+
+The cache is enabled either by calling `enable_cache` or by setting the `SMITFIT_CACHE_DIR`
+environment variable.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Union
+
+DEFAULT_MAX_SIZE = 100 * 2**20  # 100 MiB
+SUFFIX = ".py"
+
+
+def default_cache_dir() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "smitfit"
+
+
+class SourceCache:
+    """Directory of generated source files with least-recently-used eviction.
+
+    Args:
+        directory: Directory to store source files in. Created if it does not exist.
+        max_size: Maximum total size of the cached files in bytes.
+    """
+
+    def __init__(
+        self,
+        directory: Union[os.PathLike[str], str, None] = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        self.directory = Path(directory) if directory is not None else default_cache_dir()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{SUFFIX}"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            source = path.read_text()
+        except FileNotFoundError:
+            return None
+
+        # mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return source
+
+    def put(self, key: str, source: str) -> None:
+        # write to a temporary file first such that concurrent processes never read partial files
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(source)
+        os.replace(tmp, self._path(key))
+
+        self.evict(keep=key)
+
+    def files(self) -> list[Path]:
+        return list(self.directory.glob(f"*{SUFFIX}"))
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached files in bytes"""
+        return sum(_file_size(p) for p in self.files())
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Remove least recently used files until the total size is below `max_size`.
+
+        Args:
+            keep: Key of an entry which is never removed, ie the one just written. Its mtime does
+                not have to be the most recent one, as filesystems have limited mtime resolution.
+        """
+        entries = []
+        for path in self.files():
+            if keep is not None and path == self._path(keep):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            total += _file_size(self._path(keep))
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        """Remove all cached files"""
+        for path in self.files():
+            path.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.files())
+
+    def __repr__(self) -> str:
+        return f"SourceCache({str(self.directory)!r}, max_size={self.max_size})"
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+_cache: Optional[SourceCache] = (
+    SourceCache(os.environ["SMITFIT_CACHE_DIR"]) if os.environ.get("SMITFIT_CACHE_DIR") else None
+)
+
+
+def enable_cache(
+    directory: Union[os.PathLike[str], str, None] = None, max_size: int = DEFAULT_MAX_SIZE
+) -> SourceCache:
+    """Enable the on-disk cache of generated source code.
+
+    Args:
+        directory: Cache directory, defaults to `$XDG_CACHE_HOME/smitfit` or `~/.cache/smitfit`.
+        max_size: Maximum total size of the cache in bytes.
+
+    Returns:
+        The active cache.
+    """
+    global _cache
+    _cache = SourceCache(directory, max_size=max_size)
+    return _cache
+
+
+def disable_cache() -> None:
+    """Disable the on-disk cache. Cached files are kept."""
+    global _cache
+    _cache = None
+
+
+def get_cache() -> Optional[SourceCache]:
+    """Returns the active cache or `None` if caching is disabled"""
+    return _cache
+
+
+def clear_cache(directory: Union[os.PathLike[str], str, None] = None) -> None:
+    """Remove all cached files from `directory`, defaults to the active cache's directory or the
+    default cache directory."""
+    if directory is not None:
+        path = Path(directory)
+    elif _cache is not None:
+        path = _cache.directory
+    else:
+        path = default_cache_dir()
+
+    if path.exists():
+        SourceCache(path).clear()
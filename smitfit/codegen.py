@@ -0,0 +1,516 @@
+"""Generation of numerical python code from (collections of) sympy expressions.
+
+In contrast to `sympy.lambdify`, all expressions are lowered into a single function with common
+subexpressions eliminated across all outputs, and matrix expressions are evaluated into one
+array, with the same layout as `SympyMatrixExpr` (`base_shape + matrix.shape`).
+
+Two backends are available: "numpy" generates vectorized numpy code and "numba" generates a
+parallel elementwise loop over all data points, compiled with numba.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import hashlib
+import itertools
+import linecache
+import math
+import warnings
+from typing import Any, Callable, Iterable, Iterator, Literal, Sequence, Union
+
+import numpy as np
+import scipy
+import scipy.constants
+import scipy.special
+import sympy as sp
+from sympy.printing.numpy import SciPyPrinter
+
+from smitfit.cache import get_cache
+
+FUNCTION_NAME = "_lambdified"
+
+# increment when the format of generated source changes, invalidates cached source
+CODEGEN_VERSION = 1
+
+SympyObject = Union[sp.Expr, sp.MatrixBase]
+Backend = Literal["numpy", "numba"]
+BACKENDS = ("numpy", "numba")
+
+_counter = itertools.count()
+
+# set during batched evaluation, where a leading axis of size 1 is a batch axis
+_batched = contextvars.ContextVar("smitfit_batched", default=False)
+
+
+@contextlib.contextmanager
+def batched_evaluation() -> Iterator[None]:
+    """Context in which matrix outputs keep a broadcasted shape of (1,), ie a batch of size 1,
+    instead of squeezing it."""
+    token = _batched.set(True)
+    try:
+        yield
+    finally:
+        _batched.reset(token)
+
+
+def is_batched_evaluation() -> bool:
+    """Returns `True` within `batched_evaluation`"""
+    return _batched.get()
+
+
+def broadcast_template(template: np.ndarray, *args) -> np.ndarray:
+    """Returns a writable copy of `template` expanded on the first axes to the broadcasted
+    shape of `args`."""
+    base_shape = np.broadcast_shapes(*(getattr(arg, "shape", tuple()) for arg in args))
+
+    # squeeze last dim if shape is (1,), unless it is a batch axis
+    if base_shape == (1,) and not _batched.get():
+        base_shape = ()
+
+    return np.broadcast_to(template, base_shape + template.shape).copy()
+
+
+def _printer() -> SciPyPrinter:
+    return SciPyPrinter(
+        {
+            "fully_qualified_modules": True,
+            "inline": True,
+            "allow_unknown_functions": True,
+            "user_functions": {},
+        }
+    )
+
+
+def _constant_value(expr: sp.Expr) -> float | None:
+    if expr.free_symbols:
+        return None
+    try:
+        return float(expr)  # type: ignore
+    except TypeError:
+        return None
+
+
+def _split_constants(matrix: sp.MatrixBase) -> tuple[np.ndarray, dict[tuple[int, int], sp.Expr]]:
+    """Split a matrix in a template array of constant elements and a dictionary of
+    index: expression of non-constant elements.
+
+    Constant elements are evaluated once into the template, others are evaluated on each call.
+    """
+    template = np.zeros(matrix.shape)
+    elements = {}
+    for idx in np.ndindex(matrix.shape):
+        value = _constant_value(matrix[idx])
+        if value is None:
+            elements[idx] = matrix[idx]
+        else:
+            template[idx] = value
+
+    return template, elements
+
+
+def extract_constant_subexpressions(
+    exprs: Sequence[SympyObject], constant: set[str], prefix: str = "_precomputed"
+) -> tuple[list[SympyObject], dict[sp.Symbol, sp.Expr]]:
+    """Replace the largest subexpressions which depend only on symbols named in `constant` by
+    new symbols.
+
+    Constant terms of sums and factors of products are grouped, such that for example
+    `a*exp(-x**2)*x + b` with constant `x` becomes `a*_precomputed_0 + b`.
+
+    Args:
+        exprs: Scalar or matrix sympy expressions.
+        constant: Names of symbols whose values do not change, e.g. data.
+        prefix: Prefix of the names of the new symbols.
+
+    Returns:
+        Tuple of expressions with constant subexpressions replaced, and dictionary of new
+        symbol: constant subexpression.
+    """
+    replacements: dict[sp.Expr, sp.Symbol] = {}
+
+    def is_constant(node: sp.Basic) -> bool:
+        return bool(node.free_symbols) and all(s.name in constant for s in node.free_symbols)
+
+    def replace(node: sp.Basic) -> sp.Basic:
+        if not isinstance(node, sp.Expr) or isinstance(node, sp.Symbol):
+            return node.func(*(replace(arg) for arg in node.args)) if node.args else node
+        if is_constant(node):
+            if node not in replacements:
+                replacements[node] = sp.Symbol(f"{prefix}_{len(replacements)}")
+            return replacements[node]
+        if not node.args:
+            return node
+
+        if isinstance(node, (sp.Add, sp.Mul)):
+            const_args = [arg for arg in node.args if is_constant(arg)]
+            if len(const_args) > 1 or any(not arg.is_Symbol for arg in const_args):
+                # group constant terms / factors, including numbers
+                numbers = [arg for arg in node.args if not arg.free_symbols]
+                other = [arg for arg in node.args if arg.free_symbols and not is_constant(arg)]
+                grouped = replace(node.func(*numbers, *const_args))
+                return node.func(grouped, *(replace(arg) for arg in other))
+
+        return node.func(*(replace(arg) for arg in node.args))
+
+    reduced: list[SympyObject] = []
+    for expr in exprs:
+        if isinstance(expr, sp.MatrixBase):
+            reduced.append(expr.applyfunc(replace))
+        else:
+            reduced.append(replace(sp.sympify(expr)))  # type: ignore
+
+    return reduced, {v: k for k, v in replacements.items()}
+
+
+def _rename(
+    args: Sequence[sp.Symbol], exprs: Sequence[SympyObject]
+) -> tuple[list[sp.Symbol], list[SympyObject]]:
+    """Rename `args` to positional names such that any symbol name results in valid code"""
+    arg_map = {s: sp.Symbol(f"_a{i}") for i, s in enumerate(args)}
+    return list(arg_map.values()), [sp.sympify(e).xreplace(arg_map) for e in exprs]
+
+
+def source_key(
+    args: Sequence[sp.Symbol], exprs: SympyObject | Sequence[SympyObject], cse: bool = True
+) -> str:
+    """Stable hash of expressions and argument order, used as key for cached source."""
+    single = not isinstance(exprs, (list, tuple))
+    renamed_args, renamed = _rename(args, [exprs] if single else exprs)  # type: ignore
+
+    h = hashlib.sha256()
+    for item in [CODEGEN_VERSION, sp.__version__, cse, single, renamed_args, *renamed]:
+        h.update(sp.srepr(item).encode())
+        h.update(b"\0")
+
+    return h.hexdigest()
+
+
+def generate_source(
+    args: Sequence[sp.Symbol],
+    exprs: SympyObject | Sequence[SympyObject],
+    cse: bool = True,
+) -> str:
+    """Generate the source of a function `_lambdified` which takes `args` as positional arguments
+    and returns evaluated `exprs`.
+
+    Args:
+        args: Symbols to use as positional arguments.
+        exprs: Scalar or matrix sympy expression, or a list thereof, in which case a tuple is
+            returned.
+        cse: If `True`, common subexpressions are eliminated across all `exprs`.
+
+    Returns:
+        Python source code.
+    """
+    single = not isinstance(exprs, (list, tuple))
+    renamed_args, renamed = _rename(args, [exprs] if single else exprs)  # type: ignore
+    matrix_args = [
+        sorted(e.free_symbols, key=str) if isinstance(e, sp.MatrixBase) else None for e in renamed
+    ]
+
+    if cse:
+        replacements, reduced = sp.cse(renamed, symbols=sp.numbered_symbols("_c"), list=True)
+    else:
+        replacements, reduced = [], renamed
+
+    printer = _printer()
+    header, body = [], []
+    for sym, sub_expr in replacements:
+        body.append(f"{sym} = {printer.doprint(sub_expr)}")
+
+    for i, (expr, base_args) in enumerate(zip(reduced, matrix_args)):
+        if base_args is None:
+            body.append(f"_y{i} = {printer.doprint(expr)}")
+            continue
+
+        template, elements = _split_constants(expr)
+        header.append(f"_t{i} = numpy.array({template.tolist()!r})")
+        arg_str = "".join(f"{s}, " for s in base_args)
+        body.append(f"_y{i} = broadcast_template(_t{i}, {arg_str})")
+        for (j, k), elem in elements.items():
+            body.append(f"_y{i}[..., {j}, {k}] = {printer.doprint(elem)}")
+
+    if single:
+        body.append("return _y0")
+    else:
+        outputs = "".join(f"_y{i}, " for i in range(len(renamed)))
+        body.append(f"return ({outputs})")
+
+    signature = ", ".join(str(s) for s in renamed_args)
+    lines = header + ["", f"def {FUNCTION_NAME}({signature}):"] + ["    " + b for b in body]
+
+    return "\n".join(lines) + "\n"
+
+
+class GeneratedFunction:
+    """Function compiled from generated source code.
+
+    Pickles as its source code, such that unpickling (ie in worker processes) only compiles the
+    source, without generating code from sympy expressions again.
+    """
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self._func = _compile(source)
+        functools.update_wrapper(self, self._func)
+
+    def __call__(self, *args):
+        return self._func(*args)
+
+    def __reduce__(self):
+        return GeneratedFunction, (self.source,)
+
+
+def compile_source(source: str) -> GeneratedFunction:
+    """Compile source generated by `generate_source` and return the resulting function."""
+    return GeneratedFunction(source)
+
+
+def _compile(source: str) -> Callable:
+    namespace: dict[str, Any] = {
+        "functools": functools,  # Min and Max are printed as `functools.reduce`
+        "numpy": np,
+        "scipy": scipy,
+        "broadcast_template": broadcast_template,
+    }
+
+    filename = f"<smitfit-generated-{next(_counter)}>"
+    exec(compile(source, filename, "exec"), namespace)
+
+    # register source such that it shows up in tracebacks
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+
+    return namespace[FUNCTION_NAME]
+
+
+class UnsupportedByNumba(Exception):
+    """Raised when expressions cannot be compiled by numba"""
+
+
+class NumbaFunction:
+    """Evaluates expressions with a numba compiled parallel loop over all elements of the
+    broadcasted shape of the arguments, without allocating temporary arrays for intermediate
+    results.
+
+    Outputs have the same shapes as those of the numpy backend. A kernel is compiled on first use
+    for each combination of scalar and array arguments.
+
+    Args:
+        args: Symbols to use as positional arguments.
+        exprs: Scalar or matrix sympy expression, or a list thereof.
+        cse: If `True`, common subexpressions are eliminated across all `exprs`.
+
+    Raises:
+        UnsupportedByNumba: If the expressions contain functions numba cannot compile.
+    """
+
+    def __init__(
+        self,
+        args: Sequence[sp.Symbol],
+        exprs: SympyObject | Sequence[SympyObject],
+        cse: bool = True,
+    ) -> None:
+        import numba
+        from numba.core.errors import NumbaError
+
+        self.numba = numba
+        self.single = not isinstance(exprs, (list, tuple))
+        renamed_args, renamed = _rename(args, [exprs] if self.single else exprs)  # type: ignore
+        self.n_args = len(renamed_args)
+
+        # indices of arguments each output depends on, determines the output shape
+        self.output_args = [
+            [i for i, s in enumerate(renamed_args) if s in e.free_symbols] for e in renamed
+        ]
+        self.is_matrix = [isinstance(e, sp.MatrixBase) for e in renamed]
+
+        # within the loop, arguments are referred to by their per-element value
+        value_map = {s: sp.Symbol(f"_v{i}") for i, s in enumerate(renamed_args)}
+        renamed = [e.xreplace(value_map) for e in renamed]
+
+        if cse:
+            replacements, reduced = sp.cse(renamed, symbols=sp.numbered_symbols("_c"), list=True)
+        else:
+            replacements, reduced = [], renamed
+
+        printer = _printer()
+        self.body = [f"{sym} = {printer.doprint(sub_expr)}" for sym, sub_expr in replacements]
+        self.templates: dict[int, np.ndarray] = {}
+        for i, expr in enumerate(reduced):
+            if self.is_matrix[i]:
+                self.templates[i], elements = _split_constants(expr)
+                for (j, k), elem in elements.items():
+                    self.body.append(f"_o{i}[_i, {j}, {k}] = {printer.doprint(elem)}")
+            else:
+                self.body.append(f"_o{i}[_i] = {printer.doprint(expr)}")
+
+        self._kernels: dict[tuple[bool, ...], Callable] = {}
+
+        # compile the kernel for array arguments up front, such that functions numba cannot type
+        # (ie scipy functions, `numpy.select` for Piecewise, `Max`) are detected at construction
+        try:
+            self(*np.ones((self.n_args, 1)))
+        except NumbaError as e:
+            raise UnsupportedByNumba("Expression contains functions not supported by numba") from e
+
+    def __getstate__(self) -> dict[str, Any]:
+        # compiled kernels and the numba module are not pickled, kernels are compiled on first use
+        state = self.__dict__.copy()
+        del state["numba"]
+        state["_kernels"] = {}
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        import numba
+
+        self.__dict__.update(state)
+        self.numba = numba
+
+    def kernel_source(self, array_args: tuple[bool, ...]) -> str:
+        """Source of the kernel for arguments which are arrays (`True`) or scalars (`False`)"""
+        outputs = "".join(f"_o{i}, " for i in range(len(self.is_matrix)))
+        inputs = ", ".join(f"_a{i}" for i in range(self.n_args))
+        loads = [
+            f"_v{i} = _a{i}[_i]" if is_array else f"_v{i} = _a{i}"
+            for i, is_array in enumerate(array_args)
+        ]
+
+        lines = [
+            "@numba.njit(parallel=True)",
+            f"def {FUNCTION_NAME}(_n, {outputs}{inputs}):",
+            "    for _i in numba.prange(_n):",
+        ] + ["        " + line for line in loads + self.body]
+
+        return "\n".join(lines) + "\n"
+
+    def kernel(self, array_args: tuple[bool, ...]) -> Callable:
+        try:
+            return self._kernels[array_args]
+        except KeyError:
+            namespace: dict[str, Any] = {"numpy": np, "numba": self.numba}
+            exec(compile(self.kernel_source(array_args), "<smitfit-numba>", "exec"), namespace)
+            self._kernels[array_args] = namespace[FUNCTION_NAME]
+            return self._kernels[array_args]
+
+    def __call__(self, *values):
+        arrays = [np.asarray(v, dtype=np.float64) for v in values]
+        shape = np.broadcast_shapes(*(a.shape for a in arrays))
+        n = math.prod(shape)
+
+        array_args = tuple(a.ndim > 0 for a in arrays)
+        inputs = [
+            np.ascontiguousarray(np.broadcast_to(a, shape)).reshape(n) if is_array else float(a)
+            for a, is_array in zip(arrays, array_args)
+        ]
+        outputs = [
+            (
+                np.broadcast_to(self.templates[i], (n,) + self.templates[i].shape).copy()
+                if is_matrix
+                else np.empty(n)
+            )
+            for i, is_matrix in enumerate(self.is_matrix)
+        ]
+
+        self.kernel(array_args)(n, *outputs, *inputs)
+
+        results = tuple(
+            self._reshape_output(i, out, shape, arrays) for i, out in enumerate(outputs)
+        )
+
+        return results[0] if self.single else results
+
+    def _reshape_output(
+        self, i: int, out: np.ndarray, shape: tuple[int, ...], arrays: list[np.ndarray]
+    ) -> np.ndarray:
+        """Reshape a flat output array to the shape the numpy backend would return"""
+        out_shape = np.broadcast_shapes(*(arrays[j].shape for j in self.output_args[i]))
+        if self.is_matrix[i] and out_shape == (1,) and not _batched.get():
+            out_shape = ()
+
+        # outputs are evaluated over all elements, take the part matching the output's own shape
+        n_lead = len(shape) - len(out_shape)
+        idx = (0,) * n_lead + tuple(
+            slice(None) if size == full_size else slice(0, 1)
+            for size, full_size in zip(out_shape, shape[n_lead:])
+        )
+        out = out.reshape(shape + out.shape[1:])[idx]
+
+        return out if out.ndim else out[()]
+
+
+def lambdify(
+    args: Sequence[sp.Symbol],
+    exprs: SympyObject | Sequence[SympyObject],
+    cse: bool = True,
+    backend: Backend = "numpy",
+) -> Callable:
+    """Convert `exprs` into a single function taking `args` as positional arguments and returning
+    numerical values of `exprs`, as a tuple if `exprs` is a list or tuple.
+
+    If the on-disk cache is enabled (see `smitfit.cache`), generated source is loaded from
+    or stored in the cache.
+
+    The "numba" backend falls back to "numpy" with a warning if numba is not installed or if the
+    expressions contain functions which are not supported by numba.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Invalid backend {backend!r}, must be one of {BACKENDS}")
+
+    if backend == "numba":
+        try:
+            return NumbaFunction(args, exprs, cse=cse)
+        except ImportError:
+            warnings.warn("Numba is not installed, falling back to 'numpy' backend")
+        except UnsupportedByNumba as e:
+            warnings.warn(f"{e}, falling back to 'numpy' backend")
+
+    cache = get_cache()
+    if cache is None:
+        return compile_source(generate_source(args, exprs, cse=cse))
+
+    key = source_key(args, exprs, cse=cse)
+    source = cache.get(key)
+    if source is None:
+        source = generate_source(args, exprs, cse=cse)
+        cache.put(key, source)
+
+    return compile_source(source)
+
+
+def generate_code(fitter) -> None:
+    """Generate code for the model and jacobian of `fitter` ahead of fitting, such that pickled
+    copies of the fitter (ie in worker processes) only compile generated source."""
+    from smitfit.expr import Expr
+
+    model = fitter.loss.model
+    exprs = list(model.expr.values())
+
+    # partition the model with the data and fixed parameters as constants, as fitters bind it,
+    # which generates code for constant subexpressions and the expressions they are reduced from
+    bound = {**fitter.xdata, **fitter.fixed_values}.keys() - set(fitter.fit_parameter_shapes)
+    _, steps = model.partition(frozenset(bound))
+    exprs += [
+        step.func.__self__
+        for step in steps
+        if isinstance(getattr(step.func, "__self__", None), Expr)
+    ]
+
+    jacobian = getattr(fitter, "jacobian", None)
+    if jacobian is not None:
+        exprs += [d for derivatives in jacobian.expr.values() for d in derivatives.values()]
+    _generate_code(exprs)
+
+
+def _generate_code(exprs: Iterable) -> None:
+    from smitfit.composite_expr import CompositeExpr
+    from smitfit.expr import GetItem, SympyExpr, SympyMatrixExpr
+
+    for expr in exprs:
+        if isinstance(expr, (SympyExpr, SympyMatrixExpr)):
+            expr.lambdified
+        elif isinstance(expr, CompositeExpr):
+            _generate_code(expr.expr.values())
+        elif isinstance(expr, GetItem):
+            _generate_code([expr.expr])
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
 from functools import cached_property
-from typing import Optional, Dict, Any
+from typing import Literal, Optional, Dict, Any
 
 import numpy as np
 import sympy as sp
+from scipy import sparse
+from sympy.matrices.sparse import SparseRepMatrix
 from scipy.integrate import solve_ivp
-from smitfit.expr import Expr, _parse_subs_args, as_expr
+from scipy.linalg import expm
+from scipy.sparse.linalg import expm_multiply
+from smitfit.codegen import is_batched_evaluation
+from smitfit.expr import Expr, SparseMatrixExpr, SympyMatrixExpr, _parse_subs_args, as_expr
+from smitfit.markov import TransitionTemplate
 
 
 class CompositeExpr(Expr):
@@ -46,29 +52,70 @@ class CompositeExpr(Expr):
         return result
 
 
+Solver = Literal["ivp", "eig", "expm"]
+SOLVERS = ("ivp", "eig", "expm")
+
+# `solve_ivp` methods which use the jacobian of the right-hand side
+IMPLICIT_METHODS = ("Radau", "BDF", "LSODA")
+
+
 class MarkovIVP(CompositeExpr):
     """Uses scipy.integrate.solve_ivp to numerically find time evolution of a markov process
         given a transition rate matrix.
 
-    Returned shape is <states>, <datapoints>
+    Returned shape is <states>, <datapoints>, or <batch>, <states>, <datapoints> if the
+    transition rate matrix or initial populations are evaluated with leading batch dimensions (ie
+    for arrays of rates or initial populations). Batches are solved in a single call: as one
+    block-diagonal system by "ivp", or with batched linear algebra by "eig" and "expm".
+
+    Solvers:
+        "ivp": Integrate with `scipy.integrate.solve_ivp`.
+        "eig": Matrix exponential from the eigendecomposition of the transition rate matrix,
+            evaluated for all time points at once. Falls back to "ivp" if the matrix is
+            (nearly) defective.
+        "expm": Propagation with matrix exponentials between time points, using a single
+            propagator for evenly spaced time points. Falls back to "ivp" if the result is not
+            finite.
+
+    Sparse sympy transition rate matrices (`sympy.SparseMatrix`, see
+    `generate_transition_matrix`) are evaluated as `scipy.sparse` arrays, which are used as such
+    by the "ivp" and "expm" solvers. The "eig" solver converts them to dense arrays.
+
+    The right-hand side is linear, such that implicit `solve_ivp` methods are given the transition
+    rate matrix as exact jacobian, unless `jac` or `jac_sparsity` are given in `ivp_kwargs`. Pass
+    `jac_sparsity=True` to use finite differences with the nonzero structure of a symbolic
+    transition rate matrix instead. The right-hand side is vectorized. For batches, a `jac` array
+    or `jac_sparsity` is expanded to the block-diagonal system, a callable `jac` is not supported.
 
     """
 
+    max_condition = 1e8
+    """Maximum condition number of the eigenvector matrix for the "eig" solver"""
+
     def __init__(
         self,
         t: sp.Symbol | sp.Expr | Expr,
         trs_matrix: sp.Matrix | Expr,
         y0: sp.Matrix | Expr,
         domain: Optional[tuple[float, float]] = None,
+        solver: Solver = "ivp",
         **ivp_kwargs,
     ):
+        if solver not in SOLVERS:
+            raise ValueError(f"Invalid solver {solver!r}, must be one of {SOLVERS}")
+
+        if isinstance(trs_matrix, SparseRepMatrix):
+            trs_matrix = SparseMatrixExpr(trs_matrix)
         d = {"t": t, "trs_matrix": trs_matrix, "y0": y0}
         expr = {k: as_expr(v) for k, v in d.items()}
         super().__init__(expr)
 
         ivp_defaults = {"method": "Radau"}
         self.ivp_defaults = ivp_defaults | ivp_kwargs
+        if self.ivp_defaults.get("jac_sparsity") is True:
+            self.ivp_defaults["jac_sparsity"] = self.sparsity()
         self.domain = domain
+        self.solver = solver
 
     def __call__(self, **kwargs):
         components = super().__call__(**kwargs)
@@ -77,16 +124,164 @@ class MarkovIVP(CompositeExpr):
         # does not have to be determined for every call
         # although its every fast to do so
         domain = self.domain or self.get_domain(components["t"])
+        t = components["t"]
+        trs_matrix, y0, batch_shape = self.broadcast(components["trs_matrix"], components["y0"])
+
+        y = None
+        if self.solver == "eig":
+            y = self.solve_eig(t - domain[0], trs_matrix, y0)
+        elif self.solver == "expm":
+            y = self.solve_expm(t - domain[0], trs_matrix, y0)
+
+        if y is None:
+            y = self.solve_ivp(t, domain, trs_matrix, y0)
+
+        return y.reshape(batch_shape + y.shape[1:])
+
+    @staticmethod
+    def broadcast(
+        trs_matrix: np.ndarray | sparse.sparray, y0: np.ndarray
+    ) -> tuple[np.ndarray | sparse.sparray, np.ndarray, tuple[int, ...]]:
+        """Broadcast the batch dimensions of transition rate matrices and initial populations.
+
+        Singleton batch axes are dropped from the batch shape, such as those inserted by
+        `Model.call_batched` to broadcast batched rates against the time points. During batched
+        evaluation, the leading batch axis is kept.
+
+        Returns:
+            Transition rate matrices of shape (batch, states, states), or a single sparse matrix,
+            initial populations of shape (batch, states) and the batch shape.
+        """
+        y0 = np.asarray(y0, dtype=float)
+        if y0.ndim >= 2 and y0.shape[-1] == 1:
+            y0 = y0[..., 0]
+        n = y0.shape[-1]
+
+        if sparse.issparse(trs_matrix):
+            batch_shape = y0.shape[:-1]
+        else:
+            trs_matrix = np.asarray(trs_matrix)
+            batch_shape = np.broadcast_shapes(trs_matrix.shape[:-2], y0.shape[:-1])
+            trs_matrix = np.broadcast_to(trs_matrix, batch_shape + (n, n)).reshape(-1, n, n)
+        y0 = np.broadcast_to(y0, batch_shape + (n,)).reshape(-1, n)
+
+        keep = 1 if is_batched_evaluation() and batch_shape else 0
+        batch_shape = batch_shape[:keep] + tuple(size for size in batch_shape[keep:] if size != 1)
+
+        return trs_matrix, y0, batch_shape
+
+    def solve_ivp(
+        self,
+        t: np.ndarray,
+        domain: tuple[float, float],
+        trs_matrix: np.ndarray | sparse.sparray,
+        y0: np.ndarray,
+    ) -> np.ndarray:
+        """Populations at times `t` from `scipy.integrate.solve_ivp`. Batches are solved as a
+        single block-diagonal system."""
+        batch_size, n = y0.shape
+        if sparse.issparse(trs_matrix):
+            if batch_size > 1:
+                trs_matrix = sparse.kron(sparse.eye_array(batch_size), trs_matrix, format="csr")
+        elif batch_size > 1:
+            trs_matrix = sparse.block_diag(list(trs_matrix), format="csr")
+        else:
+            trs_matrix = trs_matrix[0]
+
+        options = {"vectorized": True} | self.ivp_defaults
+        if batch_size > 1 and options.get("jac_sparsity") is not None:
+            blocks = sparse.eye_array(batch_size, dtype=bool)
+            options["jac_sparsity"] = sparse.kron(blocks, options["jac_sparsity"], format="csr")
+        if batch_size > 1 and options.get("jac") is not None:
+            if callable(options["jac"]):
+                raise ValueError("Batched evaluation does not support a callable `jac`")
+            blocks = sparse.eye_array(batch_size)
+            options["jac"] = sparse.kron(blocks, options["jac"], format="csr")
+        method = getattr(options["method"], "__name__", options["method"])
+        if method in IMPLICIT_METHODS and "jac" not in options and "jac_sparsity" not in options:
+            options["jac"] = trs_matrix
+        if method == "LSODA" and options.get("jac") is not None and not callable(options["jac"]):
+            # LSODA only takes dense jacobians, given as a callable
+            jac = options["jac"]
+            jac = jac.toarray() if sparse.issparse(jac) else np.asarray(jac)
+            options["jac"] = lambda t, y, *args: jac
+
         sol = solve_ivp(
             self.grad_func,
             domain,
-            y0=components["y0"].squeeze(),
-            t_eval=components["t"],
-            args=(components["trs_matrix"],),
-            **self.ivp_defaults,
+            y0=y0.reshape(-1),
+            t_eval=t,
+            args=(trs_matrix,),
+            **options,
         )
 
-        return sol.y
+        return sol.y.reshape(batch_size, n, -1)
+
+    def solve_eig(
+        self, t: np.ndarray, trs_matrix: np.ndarray | sparse.sparray, y0: np.ndarray
+    ) -> Optional[np.ndarray]:
+        """Populations at times `t` (relative to the start of the domain) from the
+        eigendecomposition of `trs_matrix`, or `None` if it is (nearly) defective."""
+        if sparse.issparse(trs_matrix):
+            trs_matrix = trs_matrix.toarray()[np.newaxis]
+
+        eigenvalues, eigenvectors = np.linalg.eig(trs_matrix)
+        if not np.all(np.linalg.cond(eigenvectors) < self.max_condition):
+            return None
+
+        coefficients = np.linalg.solve(eigenvectors, y0[..., np.newaxis])
+        y = eigenvectors @ (np.exp(eigenvalues[..., np.newaxis] * t) * coefficients)
+        y = y.real if np.iscomplexobj(y) else y
+
+        return y if np.all(np.isfinite(y)) else None
+
+    def solve_expm(
+        self, t: np.ndarray, trs_matrix: np.ndarray | sparse.sparray, y0: np.ndarray
+    ) -> Optional[np.ndarray]:
+        """Populations at times `t` (relative to the start of the domain) by propagating with
+        matrix exponentials, or `None` if the result is not finite.
+
+        For evenly spaced time points, a single propagator is used for all time steps. Sparse
+        matrices are applied with `scipy.sparse.linalg.expm_multiply`."""
+        t = np.atleast_1d(t)
+        step = np.diff(t)
+        evenly_spaced = len(t) > 1 and np.allclose(step, step[0])
+
+        if sparse.issparse(trs_matrix):
+            # populations of all batches as columns
+            if evenly_spaced:
+                y = expm_multiply(trs_matrix, y0.T, start=t[0], stop=t[-1], num=len(t))
+            else:
+                y = np.empty((len(t),) + y0.T.shape)
+                y[0] = expm_multiply(trs_matrix * t[0], y0.T)
+                for i, dt in enumerate(step, start=1):
+                    y[i] = expm_multiply(trs_matrix * dt, y[i - 1])
+            y = y.transpose(2, 1, 0)
+        else:
+            y = np.empty(y0.shape + (len(t),))
+            y[..., 0] = (expm(trs_matrix * t[0]) @ y0[..., np.newaxis])[..., 0]
+            propagator = expm(trs_matrix * step[0]) if evenly_spaced else None
+            for i, dt in enumerate(step, start=1):
+                p = propagator if propagator is not None else expm(trs_matrix * dt)
+                y[..., i] = (p @ y[..., i - 1, np.newaxis])[..., 0]
+
+        return y if np.all(np.isfinite(y)) else None
+
+    def sparsity(self) -> np.ndarray | sparse.csr_array:
+        """Nonzero structure of the transition rate matrix"""
+        trs_matrix = self.expr["trs_matrix"]
+        if isinstance(trs_matrix, SparseMatrixExpr):
+            rows, cols, _ = trs_matrix.structure
+            data = np.ones(len(rows), dtype=bool)
+            return sparse.csr_array((data, (rows, cols)), shape=trs_matrix.shape)
+        elif isinstance(trs_matrix, TransitionTemplate):
+            data = np.ones(len(trs_matrix.rows), dtype=bool)
+            return sparse.csr_array(
+                (data, (trs_matrix.rows, trs_matrix.cols)), shape=trs_matrix.shape
+            )
+        elif not isinstance(trs_matrix, SympyMatrixExpr):
+            raise TypeError("Sparsity structure requires a symbolic transition rate matrix")
+        return (np.array(trs_matrix.expr, dtype=object) != 0).astype(bool)
 
     def get_domain(self, arr: np.ndarray) -> tuple[float, float]:
         # padding?
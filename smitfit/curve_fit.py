@@ -1,6 +1,9 @@
+from typing import Callable, Optional
+
+from smitfit.memoize import EvaluationCache
 from smitfit.result import Result
 from smitfit.function import Function
-from smitfit.parameter import Parameters, pack, unpack, scipy_bounds
+from smitfit.parameter import PackingPlan, Parameters, scipy_bounds
 import numpy as np
 from scipy.optimize import curve_fit
 
@@ -11,27 +14,53 @@ class CurveFit:
         self.parameters = parameters
         self.xdata = xdata
         self.ydata = ydata
+        self.plan = PackingPlan.from_parameters(self.parameters.free)
+        self.fixed_values = self.parameters.fixed.guess
+        self.bound_func: Optional[Callable] = None
+        self.model_cache: Optional[EvaluationCache[np.ndarray]] = None
+
+    def bind(self) -> Callable:
+        """Bind x data and fixed parameters to the function, such that it takes the free
+        parameters as positional arguments. Parts of the function which depend only on x data
+        and fixed parameters are evaluated once."""
+        names = [p.name for p in self.parameters.free]
+        return self.func.bind(names, **self.xdata, **self.fixed_values)
+
+    def evaluate(self, x: np.ndarray) -> np.ndarray:
+        """Evaluate the bound function at the packed free parameters `x`"""
+        assert self.bound_func is not None
+        return self.bound_func(*self.plan.unpack(x).values())
 
     def f(self, xdata: np.ndarray, *args):
+        kwargs = self.plan.unpack(np.array(args))
         unstacked_x = {k: v for k, v in zip(self.xdata, np.atleast_2d(xdata))}
-        kwargs = unpack(args, self.parameters.free.shapes)
-        return self.func(**unstacked_x, **kwargs, **self.parameters.fixed.guess)
+        return self.func(**unstacked_x, **kwargs, **self.fixed_values)
+
+    def _f_bound(self, _, *args):
+        # objective for curve_fit: `self.xdata` is bound in `bound_func`, its `xdata` is ignored
+        x = np.array(args)
+        return self.evaluate(x) if self.model_cache is None else self.model_cache(x)
 
     def fit(self) -> Result:
-        p0 = pack(self.parameters.free.guess.values())
+        # the packing layout and fixed values are frozen for the duration of the fit
+        self.plan = PackingPlan.from_parameters(self.parameters.free)
+        self.fixed_values = self.parameters.fixed.guess
+        self.bound_func = self.bind()
+        self.model_cache = EvaluationCache(self.evaluate)
+        p0 = self.plan.pack(self.parameters.free.guess)
         ydata = self.ydata[self.func.y.name]
         xdata = np.stack(list(self.xdata.values()))
 
         bounds = scipy_bounds(self.parameters.free) or (-np.inf, np.inf)
         popt, pcov, infodict, mesg, ier = curve_fit(
-            self.f, xdata, ydata, p0=p0, bounds=bounds, full_output=True
+            self._f_bound, xdata, ydata, p0=p0, bounds=bounds, full_output=True
         )
         base_result = dict(popt=popt, pcov=pcov, infodict=infodict, mesg=mesg, ier=ier)
 
-        errors = unpack(np.sqrt(np.diag(pcov)), self.parameters.free.shapes)
-        parameters = unpack(popt, self.parameters.free.shapes)
+        errors = self.plan.unpack(np.sqrt(np.diag(pcov)), fill_value=0.0)
+        parameters = self.plan.unpack(popt)
 
-        f = self.func(**self.xdata, **parameters, **self.parameters.fixed.guess)
+        f = self._f_bound(xdata, *popt)
         y = self.ydata[self.func.y.name]
 
         gof_qualifiers = {}
@@ -44,7 +73,7 @@ class CurveFit:
             fit_parameters=parameters,
             gof_qualifiers=gof_qualifiers,
             errors=errors,  # type: ignore
-            fixed_parameters=self.parameters.fixed.guess,
+            fixed_parameters=self.fixed_values,
             guess=self.parameters.guess,
             base_result=base_result,
         )
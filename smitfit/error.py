@@ -1,11 +1,18 @@
 from __future__ import annotations
 
-from typing import Callable
+import copy
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cached_property
+from typing import Callable, Literal, Optional
 
 import numpy as np
 
+from smitfit.codegen import generate_code
+from smitfit.loss import Loss
+from smitfit.minimize import Minimize
+from smitfit.parameter import Parameters, pack
 from smitfit.result import Result
-from smitfit.parameter import pack
 
 
 def bootstrap(
@@ -13,8 +20,9 @@ def bootstrap(
     err: float | dict[str, float],
     ydata: dict[str, np.ndarray],
     n_boot: int = 100,
-    rng=np.random.default_rng(),
+    rng: Optional[np.random.Generator] = None,
 ) -> np.ndarray:
+    rng = rng if rng is not None else np.random.default_rng()
     parameters_out = []
     errors = err if isinstance(err, dict) else {k: err for k in ydata}
     for _ in range(n_boot):
@@ -23,3 +31,186 @@ def bootstrap(
         parameters_out.append(pack(result.fit_parameters.values()))
 
     return np.array(parameters_out)
+
+
+class Bootstrap:
+    """Bootstrap fit results, with replicates fitted in parallel.
+
+    Each replicate draws from its own random stream, spawned from a `numpy.random.SeedSequence`,
+    such that results do not depend on the number of workers. Replicate fits start from the
+    parameters of the original fit.
+
+    Modes:
+        "parametric": Replicate data are the model evaluated at the original fit parameters, with
+            normally distributed noise of standard deviation `err`.
+        "nonparametric": Observations are resampled with replacement along the last axis of the
+            y data (and weights) and of the x data arrays in `resample_xdata`. Resampled
+            observations are kept in their original order.
+
+    Args:
+        loss: Loss of the original fit. Parametric mode requires a loss with `y_data`.
+        parameters: Parameters of the original fit.
+        xdata: Values of the model's independent variables.
+        result: Result of the original fit.
+        fitter: Fitter class, taking `loss`, `parameters` and `xdata`.
+        mode: "parametric" or "nonparametric".
+        err: Standard deviation of the noise in parametric mode, per output or for all outputs.
+            Defaults to the standard deviation of the residuals of the original fit.
+        n_boot: Number of replicates.
+        executor: "thread" or "process" pool, or "serial" to fit in the current thread.
+        max_workers: Number of workers.
+        seed: Entropy for the `SeedSequence` of the replicates.
+        resample_xdata: Names of the x data arrays resampled with the observations in
+            nonparametric mode, defaults to all x data.
+    """
+
+    def __init__(
+        self,
+        loss: Loss,
+        parameters: Parameters,
+        xdata: dict[str, np.ndarray],
+        result: Result,
+        fitter: type = Minimize,
+        mode: Literal["parametric", "nonparametric"] = "parametric",
+        err: Optional[float | dict[str, float]] = None,
+        n_boot: int = 100,
+        executor: Literal["serial", "thread", "process"] = "process",
+        max_workers: Optional[int] = None,
+        seed: Optional[int] = None,
+        resample_xdata: Optional[list[str]] = None,
+    ) -> None:
+        if mode not in ("parametric", "nonparametric"):
+            raise ValueError(f"Invalid mode {mode!r}, must be 'parametric' or 'nonparametric'")
+        if mode == "parametric" and not hasattr(loss, "y_data"):
+            raise ValueError("Parametric bootstrap requires a loss with 'y_data'")
+
+        self.loss = loss
+        self.parameters = parameters
+        self.xdata = xdata
+        self.result = result
+        self.fitter = fitter
+        self.mode = mode
+        self.err = err
+        self.n_boot = n_boot
+        self.executor = executor
+        self.max_workers = max_workers
+        self.seed = seed
+        self.resample_xdata = list(xdata) if resample_xdata is None else resample_xdata
+
+    def seeds(self) -> list[np.random.SeedSequence]:
+        """Seed sequences of the replicates"""
+        return np.random.SeedSequence(self.seed).spawn(self.n_boot)
+
+    def replicate(self, rng: np.random.Generator):
+        """Create a fitter for a single replicate, drawing data from `rng`"""
+        loss = copy.copy(self.loss)
+        xdata = self.xdata
+        if self.mode == "parametric":
+            loss.y_data = self._simulate(rng)  # type: ignore
+        else:
+            xdata = self._resample(rng, loss)
+
+        parameters = self.parameters.copy()
+        free = {p.name for p in parameters.free}
+        parameters.set_guesses({k: v for k, v in self.result.fit_parameters.items() if k in free})
+
+        return self.fitter(loss, parameters, xdata)
+
+    @cached_property
+    def fitted(self) -> dict[str, np.ndarray]:
+        """Model outputs at the parameters of the original fit"""
+        kwargs = {**self.result.fit_parameters, **self.result.fixed_parameters}
+        return self.loss.model(**kwargs, **self.xdata)  # type: ignore
+
+    @cached_property
+    def noise(self) -> dict[str, float]:
+        """Standard deviation of the noise per output in parametric mode"""
+        y_data: dict[str, np.ndarray] = self.loss.y_data  # type: ignore
+        if isinstance(self.err, dict):
+            return self.err
+        elif self.err is not None:
+            return {k: self.err for k in y_data}
+
+        return {k: float(np.std(self.fitted[k] - v)) for k, v in y_data.items()}
+
+    def _simulate(self, rng: np.random.Generator) -> dict[str, np.ndarray]:
+        y_data: dict[str, np.ndarray] = self.loss.y_data  # type: ignore
+        return {
+            k: self.fitted[k] + rng.normal(0, self.noise[k], size=np.shape(y_data[k]))
+            for k in y_data
+        }
+
+    def _resample(self, rng: np.random.Generator, loss: Loss) -> dict[str, np.ndarray]:
+        """Resample observations in-place in `loss` and return resampled x data"""
+        y_data = getattr(loss, "y_data", {})
+        xdata = {k: self.xdata[k] for k in self.resample_xdata}
+        lengths = {np.shape(v)[-1] if np.ndim(v) else None for v in {**y_data, **xdata}.values()}
+        if len(lengths) != 1 or None in lengths:
+            raise ValueError(
+                "Resampled y data and x data must have a last axis of equal length, use "
+                "'resample_xdata' to select the x data of the observations"
+            )
+        (n,) = lengths
+        idx = np.sort(rng.integers(0, n, size=n))
+
+        if y_data:
+            loss.y_data = {k: np.take(v, idx, axis=-1) for k, v in y_data.items()}  # type: ignore
+            # weights broadcast against y data, per-observation weights are resampled with them
+            loss.weights = {  # type: ignore
+                k: np.take(w, idx, axis=-1) if np.shape(w)[-1:] == (n,) else w
+                for k, w in loss.weights.items()  # type: ignore
+            }
+        return self.xdata | {k: np.take(v, idx, axis=-1) for k, v in xdata.items()}
+
+    def fit(self) -> list[Result]:
+        """Fit all replicates.
+
+        Returns:
+            Results of the replicates, in the order of their seeds.
+        """
+        seeds = self.seeds()
+        if self.mode == "parametric":
+            # evaluated once, rather than per replicate
+            self.fitted, self.noise
+
+        if self.executor == "serial":
+            return [_fit_replicate(self, s) for s in seeds]
+
+        # generate code once, shared by replicates or shipped to workers as source
+        generate_code(self.replicate(np.random.default_rng(self.seed)))
+
+        if self.executor == "thread":
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                return list(executor.map(lambda s: _fit_replicate(self, s), seeds))
+        elif self.executor == "process":
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(pickle.dumps(self),),
+            ) as executor:
+                return list(executor.map(_fit_worker_replicate, seeds))
+        else:
+            raise ValueError(f"Invalid executor {self.executor!r}")
+
+
+def stack_parameters(results: list[Result]) -> dict[str, np.ndarray]:
+    """Stack fit parameters of multiple results, with a leading axis over results"""
+    return {k: np.stack([r.fit_parameters[k] for r in results]) for k in results[0].fit_parameters}
+
+
+def _fit_replicate(bootstrap: Bootstrap, seed: np.random.SeedSequence) -> Result:
+    return bootstrap.replicate(np.random.default_rng(seed)).fit()
+
+
+# bootstrap of the current worker process
+_worker_bootstrap: Optional[Bootstrap] = None
+
+
+def _init_worker(payload: bytes) -> None:
+    global _worker_bootstrap
+    _worker_bootstrap = pickle.loads(payload)
+
+
+def _fit_worker_replicate(seed: np.random.SeedSequence) -> Result:
+    assert _worker_bootstrap is not None
+    return _fit_replicate(_worker_bootstrap, seed)
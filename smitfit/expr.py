@@ -2,11 +2,15 @@
 from __future__ import annotations
 
 from functools import cached_property
-from typing import Any, Callable, Iterable, Union, Mapping, Dict, Set, Tuple, Optional
+from typing import Any, Callable, Iterable, Union, Mapping, Dict, Sequence, Set, Tuple, Optional
 
 import numpy as np
 import sympy as sp
+from scipy import sparse
+
+from smitfit.codegen import Backend, batched_evaluation, lambdify
 from smitfit.typing import Numerical
+from smitfit.utils import align_batch, ensure_batch_axis
 
 
 def _parse_subs_args(
@@ -73,6 +77,31 @@ class Expr:
 
         return kwargs
 
+    @cached_property
+    def arg_symbols(self) -> list[sp.Symbol]:
+        """Symbols in the order of the positional arguments of `call_positional`"""
+        return sorted(self.symbols, key=str)
+
+    def call_positional(self, *args):
+        """Evaluate the expression with values for `arg_symbols` as positional arguments"""
+        return self(**{s.name: arg for s, arg in zip(self.arg_symbols, args)})
+
+    def call_batched(self, params: dict[str, Numerical], **kwargs):
+        """Evaluate the expression for a batch of parameter values in a single call.
+
+        Args:
+            params: Batched values, each with a leading batch axis of the same size `K`.
+            **kwargs: Unbatched values, shared by all elements of the batch.
+
+        Returns:
+            The evaluated expression with a leading batch axis of size `K`.
+        """
+        size, expanded = align_batch(params, kwargs)
+        batched = any(s.name in params for s in self.symbols)
+        with batched_evaluation():
+            result = self(**{**kwargs, **expanded})
+        return ensure_batch_axis(result, size, batched)
+
     def __getitem__(self, item):
         return GetItem(self, item)
 
@@ -125,13 +154,17 @@ class GetItem(Expr):
 
 
 class SympyExpr(Expr):
+    def __init__(self, expr: sp.Expr, backend: Backend = "numpy") -> None:
+        super().__init__(expr)
+        self.backend = backend
+
     @cached_property
     def symbols(self) -> set[sp.Symbol]:
         return self._expr.free_symbols
 
     @cached_property
     def lambdified(self) -> Callable:
-        ld = sp.lambdify(sorted(self.symbols, key=str), self._expr)
+        ld = lambdify(self.arg_symbols, self._expr, backend=self.backend)
 
         return ld
 
@@ -139,7 +172,11 @@ class SympyExpr(Expr):
         return f"SympyExpr({self._expr})"
 
     def __call__(self, **kwargs):
-        return self.lambdified(**self.filter_kwargs(**kwargs))
+        ld_kwargs = self.filter_kwargs(**kwargs)
+        return self.lambdified(*(ld_kwargs[s.name] for s in self.arg_symbols))
+
+    def call_positional(self, *args):
+        return self.lambdified(*args)
 
     def subs(self, *args, **kwargs) -> SympyExpr:
         """
@@ -155,42 +192,31 @@ class SympyExpr(Expr):
             A new SympyExpr with substituted expressions
         """
         subs_dict = _parse_subs_args(*args, symbols=self.symbols, **kwargs)
-        return SympyExpr(self._expr.subs(subs_dict))
+        return SympyExpr(self._expr.subs(subs_dict), backend=self.backend)
 
 
 class SympyMatrixExpr(Expr):
-    def __init__(self, expr: sp.MatrixBase) -> None:
+    def __init__(self, expr: sp.MatrixBase, backend: Backend = "numpy") -> None:
         super().__init__(expr)
+        self.backend = backend
 
     @cached_property
     def symbols(self) -> set[sp.Symbol]:
         return self._expr.free_symbols
 
     @cached_property
-    def lambdified(self) -> dict[tuple[int, int], Callable]:
-        lambdas = {}
-        for i, j in np.ndindex(self.expr.shape):
-            lambdas[(i, j)] = sp.lambdify(sorted(self.symbols, key=str), self.expr[i, j])
-
-        return lambdas
+    def lambdified(self) -> Callable:
+        """Single function returning the complete matrix, with common subexpressions eliminated
+        across elements and constant elements evaluated once"""
+        return lambdify(self.arg_symbols, self.expr, backend=self.backend)
 
     def __call__(self, **kwargs):
         # when marix elements != scalars, shape is expanded by the first dimensions to accomodate.
         ld_kwargs = self.filter_kwargs(**kwargs)
+        return self.lambdified(*(ld_kwargs[s.name] for s in self.arg_symbols))
 
-        base_shape = np.broadcast_shapes(
-            *(getattr(value, "shape", tuple()) for value in ld_kwargs.values())
-        )
-
-        # squeeze last dim if shape is (1,)
-        base_shape = () if base_shape == (1,) else base_shape
-        shape = base_shape + self.expr.shape
-
-        out = np.empty(shape)
-        for i, j in np.ndindex(self.expr.shape):
-            out[..., i, j] = self.lambdified[i, j](**ld_kwargs)
-
-        return out
+    def call_positional(self, *args):
+        return self.lambdified(*args)
 
     def subs(self, *args, **kwargs) -> SympyMatrixExpr:
         """
@@ -206,7 +232,64 @@ class SympyMatrixExpr(Expr):
             A new SympyMatrixExpr with substituted expressions
         """
         subs_dict = _parse_subs_args(*args, symbols=self.symbols, **kwargs)
-        return SympyMatrixExpr(self._expr.subs(subs_dict))
+        return SympyMatrixExpr(self._expr.subs(subs_dict), backend=self.backend)
+
+
+class SparseMatrixExpr(Expr):
+    """Sympy matrix evaluated as a `scipy.sparse.csr_array`.
+
+    Only the nonzero elements of the matrix are evaluated, in a single call. Values of all
+    symbols must be scalars.
+    """
+
+    def __init__(self, expr: sp.MatrixBase, backend: Backend = "numpy") -> None:
+        super().__init__(expr if isinstance(expr, sp.SparseMatrix) else sp.SparseMatrix(expr))
+        self.backend = backend
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self._expr.shape
+
+    @cached_property
+    def symbols(self) -> set[sp.Symbol]:
+        return self._expr.free_symbols
+
+    @cached_property
+    def structure(self) -> tuple[np.ndarray, np.ndarray, list[sp.Expr]]:
+        """Row indices, column indices and expressions of the nonzero elements, in row-major
+        order"""
+        elements = sorted(self._expr.todok().items())
+        rows = np.array([i for (i, _), _ in elements], dtype=np.intp)
+        cols = np.array([j for (_, j), _ in elements], dtype=np.intp)
+        return rows, cols, [v for _, v in elements]
+
+    @cached_property
+    def lambdified(self) -> Callable:
+        """Single function returning the values of all nonzero elements"""
+        values = self.structure[2]
+        return lambdify(self.arg_symbols, sp.Matrix(1, len(values), values), backend=self.backend)
+
+    def __call__(self, **kwargs):
+        ld_kwargs = self.filter_kwargs(**kwargs)
+        return self.call_positional(*(ld_kwargs[s.name] for s in self.arg_symbols))
+
+    def call_positional(self, *args):
+        rows, cols, values = self.structure
+        data = np.asarray(self.lambdified(*args), dtype=float) if values else np.empty(0)
+        if data.size != len(values):
+            raise ValueError("Sparse matrices can only be evaluated for scalar values")
+
+        return sparse.csr_array((data.reshape(-1), (rows, cols)), shape=self.shape)
+
+    def subs(self, *args, **kwargs) -> SparseMatrixExpr:
+        """
+        Substitute symbols in the matrix expression with other symbols or expressions.
+
+        Returns:
+            A new SparseMatrixExpr with substituted expressions
+        """
+        subs_dict = _parse_subs_args(*args, symbols=self.symbols, **kwargs)
+        return SparseMatrixExpr(self._expr.subs(subs_dict), backend=self.backend)
 
 
 class CustomFunction(Expr):
@@ -228,27 +311,55 @@ class CustomFunction(Expr):
         return CustomFunction(self.func, self.symbols)
 
 
-def str_to_expr(s: str) -> SympyExpr:
+def bind(expr: Expr, names: Sequence[str], **kwargs) -> Callable:
+    """Bind values in `kwargs` to the arguments of `expr`.
+
+    Returns a function which takes values for `names` as positional arguments and evaluates
+    `expr`. The argument layout is resolved once, such that calls do not match symbol names.
+    """
+    positions = {name: i for i, name in enumerate(names)}
+    template: list[Any] = []
+    index: list[tuple[int, int]] = []  # (position in values, position in arguments)
+    for j, s in enumerate(expr.arg_symbols):
+        if s.name in positions:
+            index.append((positions[s.name], j))
+            template.append(None)
+        elif s.name in kwargs:
+            template.append(kwargs[s.name])
+        else:
+            raise KeyError(f"Missing value for {s.name!r}")
+
+    def bound(*values):
+        args = template.copy()
+        for i, j in index:
+            args[j] = values[i]
+        return expr.call_positional(*args)
+
+    return bound
+
+
+def str_to_expr(s: str, backend: Backend = "numpy") -> SympyExpr:
     sp_expr = sp.parse_expr(s, evaluate=False)
     if isinstance(sp_expr, sp.Equality):  # this is a special case for root finding
-        return SympyExpr(sp_expr.lhs - sp_expr.rhs)  # type: ignore
+        return SympyExpr(sp_expr.lhs - sp_expr.rhs, backend=backend)  # type: ignore
     elif isinstance(sp_expr, sp.Expr):
-        return SympyExpr(sp_expr)
+        return SympyExpr(sp_expr, backend=backend)
     else:
         raise ValueError(f"Invalid string expression: {s!r}")
 
 
-def as_expr(expr: Any) -> Expr:
+def as_expr(expr: Any, backend: Backend = "numpy") -> Expr:
+    """Convert `expr` to an `Expr`, sympy expressions are evaluated with `backend`"""
     if isinstance(expr, Expr):
         return expr
     elif isinstance(expr, str):
-        return str_to_expr(expr)
+        return str_to_expr(expr, backend=backend)
     elif isinstance(expr, (float, int, np.ndarray)):  # torch tensor, ...
         return Expr(expr)
     elif isinstance(expr, sp.MatrixBase):
-        return SympyMatrixExpr(expr)
+        return SympyMatrixExpr(expr, backend=backend)
     if isinstance(expr, sp.Expr):
-        return SympyExpr(expr)
+        return SympyExpr(expr, backend=backend)
     elif isinstance(expr, dict):
         raise DeprecationWarning("To convert dicts, pass values to `as_expr` individually")
     else:
@@ -1,9 +1,10 @@
-from typing import Iterable
+from functools import cached_property
+from typing import Callable, Iterable, Sequence
 
 import sympy as sp
 
 from smitfit.expr import Expr, as_expr
-from smitfit.model import _define_parameters
+from smitfit.model import Model, _define_parameters
 from smitfit.parameter import Parameters
 from smitfit.typing import Numerical
 
@@ -38,6 +39,22 @@ class Function:
     def __call__(self, **kwargs):
         return self.expr(**kwargs)  # type: ignore
 
+    @cached_property
+    def model(self) -> Model:
+        """Single output `Model` of this function"""
+        return Model({self.y: self.expr})
+
+    def bind(self, names: Sequence[str], **kwargs) -> Callable:
+        """Bind values in `kwargs` to the function's inputs, returns a function taking values for
+        `names` as positional arguments.
+
+        Subexpressions which depend only on bound values are evaluated once.
+        """
+        bound = self.model.bind(names, **kwargs)
+        y = self.y.name
+
+        return lambda *values: bound(*values)[y]
+
     @property
     def x_symbols(self) -> set[sp.Symbol]:
         return self.expr.symbols
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+import sympy as sp
+from scipy import sparse
+
+from smitfit.expr import Expr, SympyExpr, as_expr
+from smitfit.model import Model, inline_model
+from smitfit.utils import sum_to_shape
+
+
+class Jacobian:
+    """Symbolic derivatives of the outputs of a `Model` with respect to `symbols`.
+
+    Only nonzero derivatives are stored, `expr` maps output symbols to dictionaries of
+    symbol: derivative expression.
+    """
+
+    def __init__(self, model: Model, symbols: Iterable[sp.Symbol]) -> None:
+        self.model = model
+        self.symbols = sorted(symbols, key=str)
+
+        self.expr: dict[sp.Symbol, dict[sp.Symbol, Expr]] = {}
+        self.is_matrix: dict[sp.Symbol, bool] = {}
+        for y, expr in inline_model(model).items():
+            self.is_matrix[y] = isinstance(expr, sp.MatrixBase)
+            derivatives = {}
+            for s in self.symbols:
+                d = expr.diff(s)
+                if not (d.is_zero_matrix if self.is_matrix[y] else d == 0):
+                    derivatives[s] = as_expr(d, backend=model.backend)
+            self.expr[y] = derivatives
+
+    def __call__(self, **kwargs) -> dict[str, dict[str, np.ndarray]]:
+        return {
+            y.name: {s.name: d(**kwargs) for s, d in derivatives.items()}
+            for y, derivatives in self.expr.items()
+        }
+
+    def vjp(self, cotangents: dict[str, np.ndarray], **kwargs) -> dict[str, np.ndarray]:
+        """Vector-Jacobian product.
+
+        Args:
+            cotangents: Derivatives of a scalar (loss) with respect to model outputs.
+            **kwargs: Values of the model's input symbols.
+
+        Returns:
+            Derivatives of the scalar with respect to `symbols`, in the shape of the symbol's
+            values in `kwargs`.
+        """
+        out = {s.name: np.zeros(np.shape(kwargs[s.name])) for s in self.symbols}
+        for y, derivatives in self.expr.items():
+            if y.name not in cotangents:
+                continue
+            for s, d in derivatives.items():
+                product = cotangents[y.name] * d(**kwargs)
+                if self.is_matrix[y]:
+                    product = product.sum(axis=(-2, -1))
+                out[s.name] += sum_to_shape(product, out[s.name].shape)
+
+        return out
+
+
+def elementwise_outputs(model: Model) -> dict[sp.Symbol, bool]:
+    """Whether each output of `model` is an element-wise function of its (broadcasted) inputs,
+    ie consists only of scalar sympy expressions."""
+    elementwise: dict[sp.Symbol, bool] = {}
+    for key in model.call_stack:
+        elementwise[key] = isinstance(model.expr[key], SympyExpr) and all(
+            elementwise[s] for s in model.topology[key] if s in elementwise
+        )
+    return elementwise
+
+
+def jacobian_sparsity(
+    model: Model,
+    residual_shapes: dict[str, tuple[int, ...]],
+    parameter_shapes: dict[str, tuple[int, ...]],
+) -> sparse.csr_array:
+    """Sparsity structure of the jacobian of flattened, concatenated model outputs with respect to
+    packed parameters, derived from the symbolic dependency graph of `model`.
+
+    Outputs which are element-wise sympy expressions of their inputs only depend on the parameter
+    elements they are broadcasted from; other outputs depend on all elements of their inputs.
+
+    Args:
+        model: Model to derive the structure from.
+        residual_shapes: Output name: shape of the flattened output (ie `y_data` shapes), in the
+            order of concatenation.
+        parameter_shapes: Parameter name: shape, in the order of packing.
+
+    Returns:
+        Boolean sparse array of shape (number of residuals, number of parameter values), which
+        can be passed as `jac_sparsity` to `scipy.optimize.least_squares`.
+    """
+    outputs = {k.name: k for k in model.call_stack}
+    elementwise = elementwise_outputs(model)
+
+    offsets = np.cumsum([0] + [int(np.prod(shape)) for shape in parameter_shapes.values()])
+    param_offsets = dict(zip(parameter_shapes, offsets))
+
+    rows, cols = [], []
+    row_offset = 0
+    for name, shape in residual_shapes.items():
+        y = outputs[name]
+        size = int(np.prod(shape))
+        row_idx = np.arange(row_offset, row_offset + size)
+        dependencies = {s.name for s in model.dependencies[y]}
+        for p_name, p_shape in parameter_shapes.items():
+            if p_name not in dependencies:
+                continue
+            p_idx = param_offsets[p_name] + np.arange(int(np.prod(p_shape))).reshape(p_shape)
+            if elementwise[y] and np.broadcast_shapes(p_shape, shape) == tuple(shape):
+                rows.append(row_idx)
+                cols.append(np.broadcast_to(p_idx, shape).ravel())
+            else:
+                r, c = np.meshgrid(row_idx, p_idx.ravel(), indexing="ij")
+                rows.append(r.ravel())
+                cols.append(c.ravel())
+        row_offset += size
+
+    data_rows = np.concatenate(rows) if rows else np.array([], dtype=int)
+    data_cols = np.concatenate(cols) if cols else np.array([], dtype=int)
+    return sparse.csr_array(
+        (np.ones(len(data_rows), dtype=bool), (data_rows, data_cols)),
+        shape=(row_offset, int(offsets[-1])),
+    )
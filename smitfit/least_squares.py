@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from scipy.optimize import least_squares
+
+from smitfit.jacobian import Jacobian, elementwise_outputs
+from smitfit.loss import SELoss
+from smitfit.memoize import EvaluationCache
+from smitfit.model import BoundModel
+from smitfit.parameter import PackingPlan, Parameters, scipy_bounds
+from smitfit.result import Result
+from smitfit.utils import flat_concat
+
+
+class LeastSquares:
+    """Fit by minimizing the residuals of a `SELoss` with `scipy.optimize.least_squares`.
+
+    The jacobian of the residuals is derived symbolically when possible, otherwise it is
+    approximated by finite differences using the sparsity structure of the model.
+
+    Args:
+        loss: Squared error loss (`SELoss` or `MSELoss`).
+        parameters: Parameters to fit.
+        xdata: Values of the model's independent variables.
+    """
+
+    def __init__(self, loss: SELoss, parameters: Parameters, xdata: dict[str, np.ndarray]):
+        self.loss = loss
+        self.parameters = parameters
+        self.xdata = xdata
+        self.fit_parameter_shapes = {p.name: p.shape for p in self.parameters.free}
+        self.plan = PackingPlan.from_parameters(self.parameters.free)
+        self.fixed_values = self.parameters.fixed.guess
+        self.bound_model: Optional[BoundModel] = None
+        self.model_cache: Optional[EvaluationCache[dict[str, np.ndarray]]] = None
+
+    def bind(self) -> BoundModel:
+        """Bind data and fixed parameters to the loss' model"""
+        return self.loss.model.bind(
+            list(self.fit_parameter_shapes), **self.xdata, **self.fixed_values
+        )
+
+    def evaluate(self, x: np.ndarray) -> dict[str, np.ndarray]:
+        """Evaluate the loss' model at the packed free parameters `x`"""
+        parameters = self.plan.unpack(x)
+        if self.bound_model is None:
+            return self.loss.model(**parameters, **self.xdata, **self.fixed_values)
+        return self.bound_model(*parameters.values())
+
+    def outputs(self, x: np.ndarray) -> dict[str, np.ndarray]:
+        """Model outputs at `x`, from `model_cache` if available"""
+        return self.evaluate(x) if self.model_cache is None else self.model_cache(x)
+
+    def residuals(self, x: np.ndarray) -> np.ndarray:
+        return self.loss.residual_vector(self.outputs(x))
+
+    @cached_property
+    def jacobian(self) -> Optional[Jacobian]:
+        """Symbolic jacobian of the loss' model with respect to the free parameters, or `None`
+        if it cannot be used to compute the jacobian of the residuals."""
+        try:
+            jacobian = self.loss.model.jacobian(self.parameters.free.symbols)
+        except TypeError:
+            return None
+
+        # derivatives with respect to array parameters map onto residuals by broadcasting,
+        # which only holds for element-wise outputs
+        elementwise = elementwise_outputs(self.loss.model)
+        shapes = self.loss.residual_shapes
+        for y, derivatives in jacobian.expr.items():
+            if y.name not in shapes:
+                continue
+            for s in derivatives:
+                p_shape = self.fit_parameter_shapes[s.name]
+                if p_shape == ():
+                    continue
+                if not elementwise[y] or np.broadcast_shapes(p_shape, shapes[y.name]) != tuple(
+                    shapes[y.name]
+                ):
+                    return None
+
+        return jacobian
+
+    def jac(self, x: np.ndarray, parameters: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Jacobian of `residuals` with respect to `x`.
+
+        Args:
+            x: Packed free parameters.
+            parameters: Names of the parameters to compute columns for, other columns are zero.
+                Defaults to all free parameters.
+        """
+        assert self.jacobian is not None
+        names = None if parameters is None else set(parameters)
+        kwargs = {**self.plan.unpack(x), **self.xdata, **self.fixed_values}
+
+        shapes = self.loss.residual_shapes
+        n_rows = sum(int(np.prod(shape)) for shape in shapes.values())
+        out = np.zeros((n_rows, len(x)))
+        row = 0
+        outputs = {y.name: y for y in self.jacobian.expr}
+        for name, shape in shapes.items():
+            size = int(np.prod(shape))
+            rows = np.arange(row, row + size)
+            scale = self.loss.residual_scale * np.asarray(self.loss.weights.get(name, 1))
+            for s, d in self.jacobian.expr[outputs[name]].items():
+                if names is not None and s.name not in names:
+                    continue
+                values = np.broadcast_to(d(**kwargs) * scale, shape).ravel()
+                columns = np.broadcast_to(self.plan.indices[s.name], shape).ravel()
+                free = columns >= 0
+                out[rows[free], columns[free]] += values[free]
+            row += size
+
+        return out
+
+    def setup(self) -> None:
+        """Prepare evaluation for a fit: the packing layout and fixed values are frozen for the
+        duration of the fit"""
+        self.plan = PackingPlan.from_parameters(self.parameters.free)
+        self.fixed_values = self.parameters.fixed.guess
+        self.bound_model = self.bind()
+        self.model_cache = EvaluationCache(self.evaluate)
+
+    def fit(self, **kwargs) -> Result:
+        """Run the fit.
+
+        Args:
+            **kwargs: Additional keyword arguments passed to `scipy.optimize.least_squares`.
+        """
+        self.setup()
+        x = self.plan.pack(self.parameters.free.guess)
+
+        bounds = scipy_bounds(self.parameters.free)
+        if self.jacobian is not None:
+            kwargs.setdefault("jac", self.jac)
+        elif kwargs.get("method", "trf") != "lm":
+            sparsity = self.loss.jac_sparsity(self.fit_parameter_shapes)
+            kwargs.setdefault("jac_sparsity", sparsity[:, self.plan.free_index])
+
+        result = least_squares(
+            self.residuals,
+            x,
+            bounds=bounds if bounds is not None else (-np.inf, np.inf),
+            **kwargs,
+        )
+        J = result.jac.toarray() if hasattr(result.jac, "toarray") else result.jac
+
+        return self.make_result(result.x, result.fun, J, base_result=result)
+
+    def make_result(
+        self, x: np.ndarray, residuals: np.ndarray, J: np.ndarray, base_result: Any = None
+    ) -> Result:
+        """Create a `Result` from packed parameters `x` with `residuals` and their jacobian `J`"""
+        fit_parameters = self.plan.unpack(x)
+
+        y_model = self.outputs(x)
+        f = flat_concat({k: y_model[k] for k in self.loss.y_data})
+        y = flat_concat(self.loss.y_data)
+        gof_qualifiers = {
+            "loss": self.loss.from_outputs(y_model),
+            "r_squared": 1 - np.sum((y - f) ** 2) / np.sum((y - np.mean(y)) ** 2),
+        }
+
+        # covariance from the gauss-newton approximation of the hessian
+        N, P = len(residuals), len(x)
+        s_squared = np.sum(residuals**2) / (N - P)
+        cov_mat = s_squared * np.linalg.pinv(J.T @ J)
+        std_error = self.plan.unpack(np.sqrt(np.diag(cov_mat)), fill_value=0.0)
+
+        return Result(
+            fit_parameters=fit_parameters,
+            gof_qualifiers=gof_qualifiers,
+            errors=std_error,
+            fixed_parameters=self.fixed_values,
+            guess=self.parameters.free.guess,
+            base_result=base_result,
+        )
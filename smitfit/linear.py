@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Iterable
+
+import numpy as np
+import sympy as sp
+from scipy.optimize import least_squares
+
+from smitfit.jacobian import Jacobian
+from smitfit.least_squares import LeastSquares
+from smitfit.parameter import scipy_bounds
+from smitfit.result import Result
+
+
+def linear_parameters(jacobian: Jacobian, symbols: Iterable[sp.Symbol]) -> list[sp.Symbol]:
+    """Select a set of `symbols` in which the outputs of the jacobian's model are jointly linear.
+
+    A symbol is linear if none of the derivatives with respect to it depend on itself or on other
+    selected symbols. Of symbols which only enter as products with each other (ie `a * b`), the
+    first in sorted order is excluded.
+
+    Args:
+        jacobian: Symbolic jacobian with respect to (at least) `symbols`.
+        symbols: Candidate symbols.
+
+    Returns:
+        Linear symbols, sorted by name.
+    """
+    candidates = sorted(symbols, key=str)
+    depends: dict[sp.Symbol, set[sp.Symbol]] = {s: set() for s in candidates}
+    for derivatives in jacobian.expr.values():
+        for s, d in derivatives.items():
+            if s in depends:
+                depends[s] |= d.symbols
+
+    linear = [s for s in candidates if s not in depends[s]]
+    for s in list(linear):
+        if depends[s] & set(linear):
+            linear.remove(s)
+
+    return linear
+
+
+class LinearLeastSquares(LeastSquares):
+    """Closed-form weighted least squares fit of models which are linear in their free
+    parameters.
+
+    The jacobian of the residuals is the (weighted) design matrix, built from the symbolic
+    derivatives of the model. Parameters are solved for directly with `numpy.linalg.lstsq` and
+    the covariance matrix is exact. If the solution is outside the parameter bounds, the bounded
+    problem is solved with `scipy.optimize.least_squares`, starting from the clipped solution.
+
+    Args:
+        loss: Squared error loss (`SELoss` or `MSELoss`).
+        parameters: Parameters to fit.
+        xdata: Values of the model's independent variables.
+    """
+
+    @cached_property
+    def is_linear(self) -> bool:
+        """`True` if the model's outputs are linear in the free parameters"""
+        if self.jacobian is None:
+            return False
+        symbols = self.parameters.free.symbols
+        return len(linear_parameters(self.jacobian, symbols)) == len(symbols)
+
+    def fit(self, **kwargs) -> Result:
+        """Run the fit.
+
+        Args:
+            **kwargs: Additional keyword arguments passed to `scipy.optimize.least_squares` if
+                the solution has to be constrained to the parameter bounds.
+        """
+        if not self.is_linear:
+            raise ValueError("Model is not linear in the free parameters, use `LeastSquares`")
+
+        self.setup()
+        x0 = self.plan.pack(self.parameters.free.guess)
+
+        # residuals are linear in x: r(x) = r(x0) + J (x - x0)
+        J = self.jac(x0)
+        r0 = self.residuals(x0)
+        dx, _, rank, singular_values = np.linalg.lstsq(J, -r0, rcond=None)
+        x = x0 + dx
+        base_result = {"x": x, "rank": rank, "singular_values": singular_values}
+
+        bounds = scipy_bounds(self.parameters.free)
+        if bounds is not None and np.any((x < bounds.lb) | (x > bounds.ub)):
+            result = least_squares(
+                self.residuals,
+                np.clip(x, bounds.lb, bounds.ub),
+                jac=lambda _: J,
+                bounds=bounds,
+                **kwargs,
+            )
+            x = result.x
+            base_result["bounded_result"] = result
+
+        return self.make_result(x, r0 + J @ (x - x0), J, base_result=base_result)
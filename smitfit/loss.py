@@ -1,10 +1,20 @@
-from typing import Optional
+from __future__ import annotations
 
+import threading
+from functools import cached_property
+from typing import Iterable, NamedTuple, Optional
+
+from scipy import sparse
+
+from smitfit.jacobian import Jacobian, jacobian_sparsity
 from smitfit.model import Model
-from smitfit.reduce import mean_reduction, sum_reduction
+from smitfit.reduce import sum_reduction
 
 import numpy as np
 
+FD_STEP = np.finfo(float).eps ** (1 / 3)
+"""Relative step of finite difference gradients"""
+
 
 class Loss:
     """sum/average reduction"""
@@ -12,53 +22,253 @@ class Loss:
     def __call__(self, **kwargs) -> float:
         return 0.0
 
+    def gradient(self, jacobian: Jacobian, **kwargs) -> dict[str, np.ndarray]:
+        """Derivatives of the loss with respect to `jacobian.symbols`.
+
+        Computed with central finite differences of the loss value, losses which can be
+        differentiated through the model's jacobian override this.
+        """
+        gradient = {}
+        for symbol in jacobian.symbols:
+            value = np.asarray(kwargs[symbol.name], dtype=float)
+            derivative = np.empty_like(value)
+            for idx in np.ndindex(value.shape):
+                step = FD_STEP * max(1.0, abs(value[idx]))
+                shifted = value.copy()
+                shifted[idx] += step
+                upper = self(**{**kwargs, symbol.name: shifted})
+                shifted[idx] -= 2 * step
+                lower = self(**{**kwargs, symbol.name: shifted})
+                derivative[idx] = (upper - lower) / (2 * step)
+            gradient[symbol.name] = derivative
+
+        return gradient
+
+
+class _FlatData(NamedTuple):
+    """Layout of flattened, concatenated residuals"""
+
+    slices: dict[str, slice]
+    shapes: dict[str, tuple[int, ...]]
+    y_data: np.ndarray
+    weights: dict[str, np.ndarray]
+    buffers: dict[int, np.ndarray]
+    """Preallocated residual buffers per thread"""
+
 
 class SELoss(Loss):
-    """sum of squared errors"""
+    """sum of squared errors
+
+    Only the model outputs in `y_data` and the outputs they depend on are evaluated.
+    `y_data` and `weights` are flattened into contiguous buffers when first needed; reassign
+    them rather than modifying arrays in place.
+
+    Residuals are computed in a preallocated buffer per thread, such that the loss can be shared
+    by fitters in different threads. Evaluation is not reentrant within a thread: residuals
+    returned by `residuals_and_loss` are overwritten by the next evaluation in the same thread.
+    """
 
     # todo super call pass model
     def __init__(self, model: Model, y_data: dict, weights: Optional[dict] = None):
-        self.model = model
+        self.model = model.select(y_data)
         self.y_data = y_data
         self.weights = weights or {}
 
+    @property
+    def y_data(self) -> dict:
+        return self._y_data
+
+    @y_data.setter
+    def y_data(self, value: dict) -> None:
+        self._y_data = value
+        self.__dict__.pop("_flat", None)
+
+    @property
+    def weights(self) -> dict:
+        return self._weights
+
+    @weights.setter
+    def weights(self, value: dict) -> None:
+        self._weights = value
+        self.__dict__.pop("_flat", None)
+
+    @cached_property
+    def _flat(self) -> _FlatData:
+        shapes = {
+            k: np.broadcast_shapes(np.shape(v), np.shape(self.weights.get(k, 1)))
+            for k, v in self.y_data.items()
+        }
+        offsets = np.cumsum([0] + [int(np.prod(shape)) for shape in shapes.values()])
+        slices = {k: slice(a, b) for k, a, b in zip(shapes, offsets[:-1], offsets[1:])}
+
+        y_data = np.concatenate(
+            [np.broadcast_to(self.y_data[k], shape).ravel() for k, shape in shapes.items()]
+        )
+        # scalar weights are applied as scalars, array weights as flattened arrays
+        weights = {
+            k: (
+                np.asarray(w, dtype=float)
+                if np.ndim(w) == 0
+                else np.broadcast_to(w, shapes[k]).ravel()
+            )
+            for k, w in self.weights.items()
+            if k in shapes
+        }
+
+        return _FlatData(slices, shapes, y_data, weights, {})
+
     def residuals(self, **kwargs):
         y_model = self.model(**kwargs)
 
         return {k: y_model[k] - self.y_data[k] for k in self.y_data.keys()}
 
-    def squares(self, **kwargs):
+    def squares(self, **kwargs) -> dict[str, np.ndarray]:
+        """Squared weighted residuals per output, in the shapes of `residual_shapes`"""
         y_model = self.model(**kwargs)
+        residuals = self._fill_buffer(y_model)
+        if residuals is None:
+            return {
+                k: ((y_model[k] - self.y_data[k]) * self.weights.get(k, 1)) ** 2
+                for k in self.y_data.keys()
+            }
 
-        squares = {
-            k: ((y_model[k] - self.y_data[k]) * self.weights.get(k, 1)) ** 2
-            for k in self.y_data.keys()
+        # the buffer holds scaled residuals, squares are unscaled
+        squares = (residuals / self.residual_scale) ** 2
+        return {
+            k: squares[sl].reshape(self.residual_shapes[k]) for k, sl in self._flat.slices.items()
         }
 
-        return squares
-
     def __call__(self, **kwargs) -> float:
-        squares = self.squares(**kwargs)
+        return self.from_outputs(self.model(**kwargs))
+
+    def from_outputs(self, y_model: dict[str, np.ndarray]) -> float:
+        """Loss value from evaluated model outputs"""
+        return self.residuals_and_loss(y_model)[1]
+
+    def _fill_buffer(self, y_model: dict[str, np.ndarray]) -> Optional[np.ndarray]:
+        """Write the weighted, scaled residuals to the preallocated buffer of the current thread.
+        Returns `None` if the model outputs do not broadcast to the shapes of `y_data`."""
+        flat = self._flat
+        try:
+            out = flat.buffers[threading.get_ident()]
+        except KeyError:
+            out = np.empty_like(flat.y_data, dtype=np.result_type(flat.y_data, float))
+            flat.buffers[threading.get_ident()] = out
+        try:
+            for k, sl in flat.slices.items():
+                shape = flat.shapes[k]
+                np.subtract(y_model[k], flat.y_data[sl].reshape(shape), out=out[sl].reshape(shape))
+        except ValueError:
+            return None
+        for k, w in flat.weights.items():
+            out[flat.slices[k]] *= w
+        if (scale := self.residual_scale) != 1.0:
+            out *= scale
+
+        return out
+
+    def residuals_and_loss(self, y_model: dict[str, np.ndarray]) -> tuple[np.ndarray, float]:
+        """Flattened, concatenated residuals and the loss from evaluated model outputs, in a
+        single pass over a preallocated buffer.
+
+        The loss is the sum of squares of the residuals. The returned residuals are a view of the
+        buffer of the current thread, which is overwritten by the next call in the same thread.
+        """
+        out = self._fill_buffer(y_model)
+        if out is None:
+            out = np.concatenate(
+                [
+                    ((y_model[k] - self.y_data[k]) * self.weights.get(k, 1)).ravel()
+                    for k in self.y_data.keys()
+                ]
+            )
+            out *= self._residual_scale(out.size)
+
+        return out, float(out @ out)
+
+    def residual_vector(self, y_model: dict[str, np.ndarray]) -> np.ndarray:
+        """Flattened, concatenated residuals such that the loss is their sum of squares"""
+        return self.residuals_and_loss(y_model)[0].copy()
+
+    @property
+    def residual_scale(self) -> float:
+        """Scaling factor applied to weighted residuals in `residual_vector`"""
+        return self._residual_scale(self._flat.y_data.size)
+
+    def _residual_scale(self, size: int) -> float:
+        return 1.0
 
-        return sum_reduction(squares)
+    @property
+    def residual_shapes(self) -> dict[str, tuple[int, ...]]:
+        """Shapes of the residuals per output (`y_data` broadcasted with `weights`), before
+        flattening"""
+        return self._flat.shapes
+
+    def cotangents(self, y_model: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        """Derivatives of the loss with respect to the model outputs"""
+        flat = self._flat
+        residuals = self._fill_buffer(y_model)
+        if residuals is None:
+            cotangents = {
+                k: 2 * self.weights.get(k, 1) ** 2 * (y_model[k] - self.y_data[k])
+                for k in self.y_data.keys()
+            }
+            scale = self._residual_scale(sum(v.size for v in cotangents.values())) ** 2
+            return {k: scale * v for k, v in cotangents.items()}
+
+        cotangents = 2 * self.residual_scale * residuals
+        for k, w in flat.weights.items():
+            cotangents[flat.slices[k]] *= w
+
+        return {k: cotangents[sl].reshape(flat.shapes[k]) for k, sl in flat.slices.items()}
+
+    def gradient(self, jacobian: Jacobian, **kwargs) -> dict[str, np.ndarray]:
+        return jacobian.vjp(self.cotangents(self.model(**kwargs)), **kwargs)
+
+    def jac_sparsity(self, parameter_shapes: dict[str, tuple[int, ...]]) -> sparse.csr_array:
+        """Sparsity structure of the jacobian of the flattened residuals with respect to the
+        packed parameters in `parameter_shapes`. See `smitfit.jacobian.jacobian_sparsity`."""
+        return jacobian_sparsity(self.model, self.residual_shapes, parameter_shapes)
 
 
 class MSELoss(SELoss):
-    def __call__(self, **kwargs) -> float:
-        squares = self.squares(**kwargs)
+    """mean of squared errors"""
 
-        return mean_reduction(squares)
+    def _residual_scale(self, size: int) -> float:
+        return 1 / np.sqrt(size)
 
 
 class NLLLoss(Loss):
-    """Negative Log Likelihood Loss"""
+    """Negative Log Likelihood Loss
+
+    Args:
+        model: Model whose outputs are probability densities.
+        weights: Optional weights per output.
+        outputs: Names of the outputs to include in the likelihood, defaults to all outputs.
+            Only these outputs and the outputs they depend on are evaluated.
+    """
 
-    def __init__(self, model: Model, weights: Optional[dict] = None):
-        self.model = model
+    def __init__(
+        self,
+        model: Model,
+        weights: Optional[dict] = None,
+        outputs: Optional[Iterable[str]] = None,
+    ):
+        self.outputs = [k.name for k in model.call_stack] if outputs is None else list(outputs)
+        self.model = model.select(self.outputs)
         self.weights = weights or {}
 
     def __call__(self, **kwargs) -> float:
-        y_model = self.model(**kwargs)
+        return self.from_outputs(self.model(**kwargs))
 
-        log_likelihoods = {k: -self.weights.get(k, 1) * np.log(y_model[k]) for k in y_model}
+    def from_outputs(self, y_model: dict[str, np.ndarray]) -> float:
+        """Loss value from evaluated model outputs"""
+        log_likelihoods = {k: -self.weights.get(k, 1) * np.log(y_model[k]) for k in self.outputs}
         return sum_reduction(log_likelihoods)
+
+    def cotangents(self, y_model: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        """Derivatives of the loss with respect to the model outputs"""
+        return {k: -self.weights.get(k, 1) / y_model[k] for k in self.outputs}
+
+    def gradient(self, jacobian: Jacobian, **kwargs) -> dict[str, np.ndarray]:
+        return jacobian.vjp(self.cotangents(self.model(**kwargs)), **kwargs)
@@ -1,65 +1,222 @@
-from functools import reduce
-from operator import add
-from typing import Type
+from __future__ import annotations
 
-from sympy import Matrix, Symbol, zeros
+import copy
+from functools import cached_property
+from typing import NamedTuple, Type
+
+import numpy as np
+from scipy import sparse as sps
+from sympy import Add, Matrix, Number, SparseMatrix, Symbol, zeros
+
+from smitfit.expr import Expr, _parse_subs_args
 
 OPERATORS = ["<->", "<-", "->"]
 
 
+class Transitions(NamedTuple):
+    """Parsed connectivity of a markov chain"""
+
+    states: dict[str, int]
+    """State name: index, in order of first appearance"""
+
+    source: np.ndarray
+    """Index of the state each transition starts from"""
+
+    target: np.ndarray
+    """Index of the state each transition leads to"""
+
+    def rate_names(self, parameter_prefix: str = "k") -> list[str]:
+        """Names of the rate of each transition"""
+        names = list(self.states)
+        return [
+            f"{parameter_prefix}_{names[i]}_{names[j]}" for i, j in zip(self.source, self.target)
+        ]
+
+
+def parse_transitions(connectivity: list[str]) -> Transitions:
+    """Parse reaction equations into transitions between states, in a single pass.
+
+    Args:
+        connectivity: List of reaction equations, ie "A <-> B -> C".
+
+    Returns:
+        States and transitions, with one transition per direction of each reaction.
+
+    """
+    states: dict[str, int] = {}
+    source: list[int] = []
+    target: list[int] = []
+    for conn in connectivity:
+        split = conn.split(" ")
+        names, ops = split[::2], split[1::2]
+        if any(op not in OPERATORS for op in ops) or any(s in OPERATORS for s in names):
+            raise ValueError(f"Invalid reaction equation {conn!r}")
+        if any("_" in s for s in names):
+            raise ValueError("Underscores are not allowed in state names")
+
+        idx = [states.setdefault(s, len(states)) for s in names]
+        for i, op, j in zip(idx[:-1], ops, idx[1:]):
+            if op in ("->", "<->"):
+                source.append(i)
+                target.append(j)
+            if op in ("<-", "<->"):
+                source.append(j)
+                target.append(i)
+
+    return Transitions(states, np.array(source, dtype=np.intp), np.array(target, dtype=np.intp))
+
+
 def generate_transition_matrix(
     connectivity: list[str],
     parameter_prefix="k",
     symbol_class: Type[Symbol] = Symbol,
-) -> Matrix:
-    all_states = extract_states(connectivity)
+    sparse: bool = False,
+) -> Matrix | SparseMatrix:
+    """
+    Args:
+        connectivity: List of reaction equations.
+        parameter_prefix: Prefix of the names of the rate symbols.
+        symbol_class: Class of the rate symbols.
+        sparse: If `True`, return a `SparseMatrix`, which `MarkovIVP` evaluates as a
+            `scipy.sparse` array.
 
-    b = ["_" in s for s in all_states]
-    if any(b):
-        raise ValueError("Underscores are not allowed in state names")
+    Returns:
+        Transition rate matrix.
 
-    trs_matrix = zeros(len(all_states), len(all_states))
-    for conn in connectivity:
-        split = conn.split(" ")
-        states = [s for s in split if s not in OPERATORS]
-
-        for current_state in states:
-            i = split.index(current_state)
-            current_idx = all_states.index(current_state)
-
-            # look to the left
-            if i >= 2:
-                op = split[i - 1]
-                other_state = split[i - 2]  # refactor other
-                other_idx = all_states.index(other_state)
-                if op in ["->", "<->"]:  # flux from other state to current state
-                    # elem = self.create_element(other_state, current_state)
-                    elem = symbol_class(f"{parameter_prefix}_{other_state}_{current_state}")
-                    trs_matrix[current_idx, other_idx] += elem
-
-                if op in ["<-", "<->"]:  # flux from current state to other state
-                    # elem = self.create_element(current_state, other_state)
-                    elem = symbol_class(f"{parameter_prefix}_{current_state}_{other_state}")
-                    trs_matrix[current_idx, current_idx] -= elem
-
-            # look to the right
-            if i <= len(split) - 2:
-                op = split[i + 1]
-                other_state = split[i + 2]
-                other_idx = all_states.index(other_state)
-
-                if op in ["<-", "<->"]:  # flux from other state to current state
-                    # elem = self.create_element(other_state, current_state)
-                    elem = symbol_class(f"{parameter_prefix}_{other_state}_{current_state}")
-                    trs_matrix[current_idx, other_idx] += elem
-                if op in ["->", "<->"]:  # flux from current state to other state
-                    # elem = self.create_element(current_state, other_state)
-                    elem = symbol_class(f"{parameter_prefix}_{current_state}_{other_state}")
-                    trs_matrix[current_idx, current_idx] -= elem
+    """
+    transitions = parse_transitions(connectivity)
+
+    # collect the terms of each element, then sum them in bulk
+    terms: dict[tuple[int, int], list] = {}
+    rates = transitions.rate_names(parameter_prefix)
+    for i, j, name in zip(transitions.source, transitions.target, rates):
+        elem = symbol_class(name)
+        terms.setdefault((int(j), int(i)), []).append(elem)  # flux from state i to state j
+        terms.setdefault((int(i), int(i)), []).append(-elem)
+
+    n = len(transitions.states)
+    elements = {k: v[0] if len(v) == 1 else Add(*v) for k, v in terms.items()}
+    if sparse:
+        return SparseMatrix(n, n, elements)
+
+    trs_matrix = zeros(n, n)
+    for (i, j), elem in elements.items():
+        trs_matrix[i, j] = elem
 
     return trs_matrix
 
 
+class TransitionTemplate(Expr):
+    """Numeric template of a transition rate matrix, evaluated as `scipy.sparse.csr_array`
+    without generating code for its elements.
+
+    Nonzero values of the matrix are a linear combination of the rates, computed as a single
+    sparse matrix-vector product. Values of all rates must be scalars.
+
+    Args:
+        connectivity: List of reaction equations.
+        parameter_prefix: Prefix of the names of the rate symbols.
+        symbol_class: Class of the rate symbols.
+    """
+
+    def __init__(
+        self,
+        connectivity: list[str],
+        parameter_prefix: str = "k",
+        symbol_class: Type[Symbol] = Symbol,
+    ) -> None:
+        transitions = parse_transitions(connectivity)
+        self.states = list(transitions.states)
+        self.shape = (len(self.states), len(self.states))
+
+        # one symbol per distinct rate, repeated reactions add up
+        names = list(dict.fromkeys(transitions.rate_names(parameter_prefix)))
+        self.rates = [symbol_class(name) for name in names]
+        rate_index = {name: i for i, name in enumerate(names)}
+        columns = np.array(
+            [rate_index[name] for name in transitions.rate_names(parameter_prefix)], dtype=np.intp
+        )
+
+        # (element, rate) coefficients: +1 off-diagonal, -1 on the diagonal of the source state
+        src, tgt = transitions.source, transitions.target
+        flat, element_index = np.unique(
+            np.concatenate([tgt, src]) * self.shape[1] + np.concatenate([src, src]),
+            return_inverse=True,
+        )
+        self.rows, self.cols = np.divmod(flat, self.shape[1])
+        self.coefficients = sps.coo_array(
+            (
+                np.concatenate([np.ones(len(src)), -np.ones(len(src))]),
+                (element_index, np.concatenate([columns, columns])),
+            ),
+            shape=(len(flat), len(self.rates)),
+        ).tocsr()
+        # constant values of the nonzero elements, from rates substituted by numbers
+        self.offset = np.zeros(len(flat))
+        super().__init__(self.coefficients)
+
+    @cached_property
+    def symbols(self) -> set[Symbol]:
+        return set(self.rates)
+
+    def __call__(self, **kwargs) -> sps.csr_array:
+        kwargs = self.filter_kwargs(**kwargs)
+        rates = np.array([kwargs[s.name] for s in self.rates], dtype=float)
+        if rates.ndim != 1:
+            raise ValueError("Transition templates can only be evaluated for scalar rates")
+
+        data = self.coefficients @ rates + self.offset
+        return sps.csr_array((data, (self.rows, self.cols)), shape=self.shape)
+
+    def subs(self, *args, **kwargs) -> TransitionTemplate:
+        """
+        Substitute rates with numerical values, which are folded into the template, or rename
+        rates by substituting them with other symbols.
+
+        Returns:
+            A new TransitionTemplate with substituted rates
+
+        Raises:
+            TypeError: If a rate is substituted with a symbolic expression.
+        """
+        subs_dict = _parse_subs_args(*args, symbols=self.symbols, **kwargs)
+        index = {s: i for i, s in enumerate(self.rates)}
+
+        values = np.zeros(len(self.rates))
+        numeric = np.zeros(len(self.rates), dtype=bool)
+        renamed = list(self.rates)
+        for symbol, replacement in subs_dict.items():
+            if symbol not in index:
+                continue
+            if isinstance(replacement, Symbol):
+                renamed[index[symbol]] = replacement
+            elif isinstance(replacement, (int, float, Number)):
+                values[index[symbol]] = float(replacement)
+                numeric[index[symbol]] = True
+            else:
+                raise TypeError(
+                    f"Transition templates only support substituting rates with numbers or "
+                    f"symbols, got {replacement!r} for {symbol}"
+                )
+
+        result = copy.copy(self)
+        result.offset = self.offset + self.coefficients @ values
+
+        # renamed rates which coincide add up
+        keep = np.flatnonzero(~numeric)
+        result.rates = list(dict.fromkeys(renamed[i] for i in keep))
+        new_index = {s: i for i, s in enumerate(result.rates)}
+        merge = sps.csr_array(
+            (np.ones(len(keep)), ([new_index[renamed[i]] for i in keep], keep)),
+            shape=(len(result.rates), len(self.rates)),
+        )
+        result.coefficients = (self.coefficients @ merge.T).tocsr()
+        result._expr = result.coefficients
+        result.__dict__.pop("symbols", None)
+
+        return result
+
+
 def extract_states(connectivity: list[str]) -> list[str]:
     """
     Args:
@@ -70,12 +227,9 @@ def extract_states(connectivity: list[str]) -> list[str]:
 
     """
 
-    # extract states from connectivity list
-    all_states = [
-        s for s in reduce(add, [eqn.split(" ") for eqn in connectivity]) if s not in OPERATORS
-    ]
-
-    # Remove duplicates, keep order
-    all_states = list(dict.fromkeys(all_states))
+    # extract states from connectivity list, remove duplicates and keep order
+    all_states = dict.fromkeys(
+        s for eqn in connectivity for s in eqn.split(" ") if s not in OPERATORS
+    )
 
-    return all_states
+    return list(all_states)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, Generic, NamedTuple, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class EvaluationCache(Generic[T]):
+    """Least-recently-used cache of the results of `func`, keyed on the bytes of the packed
+    parameter vector it is called with.
+
+    Optimizers typically evaluate the objective and its gradient (or residuals and jacobian) at
+    the same parameters, and fit results are computed at the parameters last evaluated by the
+    optimizer; these evaluations are served from the cache.
+
+    Results are returned as is, and should not be modified in place by callers.
+
+    Args:
+        func: Function of a 1D array of parameter values.
+        maxsize: Maximum number of cached results.
+    """
+
+    def __init__(self, func: Callable[[np.ndarray], T], maxsize: int = 4) -> None:
+        self.func = func
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[bytes, T] = OrderedDict()
+
+    def __call__(self, x: np.ndarray) -> T:
+        x = np.asarray(x, dtype=float)
+        key = x.tobytes()
+        try:
+            result = self._cache[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return result
+
+        self.misses += 1
+        result = self.func(x.copy())
+        self._cache[key] = result
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+        return result
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._cache))
+
+    def clear(self) -> None:
+        """Clear cached results and reset counters"""
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+from functools import cached_property
+from typing import Optional
+
 import numpy as np
 from scipy.optimize import LbfgsInvHessProduct, minimize
 
-from smitfit.loss import Loss, SELoss
-from smitfit.parameter import Parameters, pack, scipy_bounds, unpack
+from smitfit.jacobian import Jacobian
+from smitfit.loss import Loss, NLLLoss, SELoss
+from smitfit.memoize import EvaluationCache
+from smitfit.model import BoundModel
+from smitfit.parameter import PackingPlan, Parameters, scipy_bounds
 from smitfit.result import Result
 from smitfit.utils import flat_concat
 
@@ -15,15 +21,71 @@ class Minimize:  # = currently only scipy minimize
         self.parameters = parameters
         self.xdata = xdata
         self.fit_parameter_shapes = {p.name: p.shape for p in self.parameters.free}
+        self.plan = PackingPlan.from_parameters(self.parameters.free)
+        self.fixed_values = self.parameters.fixed.guess
+        self.bound_model: Optional[BoundModel] = None
+        self.model_cache: Optional[EvaluationCache[dict[str, np.ndarray]]] = None
+
+    def bind(self) -> Optional[BoundModel]:
+        """Bind data and fixed parameters to the loss' model, such that the objective function
+        evaluates the model with the free parameters as positional arguments."""
+        if not isinstance(self.loss, (SELoss, NLLLoss)):
+            return None
+        return self.loss.model.bind(
+            list(self.fit_parameter_shapes), **self.xdata, **self.fixed_values
+        )
+
+    def evaluate(self, x: np.ndarray) -> dict[str, np.ndarray]:
+        """Evaluate the loss' model at the packed free parameters `x`"""
+        parameters = self.plan.unpack(x)
+        if self.bound_model is None:
+            return self.loss.model(**parameters, **self.xdata, **self.fixed_values)
+        return self.bound_model(*parameters.values())
+
+    def outputs(self, x: np.ndarray) -> dict[str, np.ndarray]:
+        """Model outputs at `x`, from `model_cache` if available"""
+        return self.evaluate(x) if self.model_cache is None else self.model_cache(x)
 
     def func(self, x: np.ndarray):
-        parameters = unpack(x, self.fit_parameter_shapes)
-        return self.loss(**parameters, **self.xdata, **self.parameters.fixed.guess)
+        if not isinstance(self.loss, (SELoss, NLLLoss)):
+            parameters = self.plan.unpack(x)
+            return self.loss(**parameters, **self.xdata, **self.fixed_values)
+
+        return self.loss.from_outputs(self.outputs(x))
+
+    @cached_property
+    def jacobian(self) -> Optional[Jacobian]:
+        """Symbolic jacobian of the loss' model with respect to the free parameters, or `None`
+        if the model contains expressions which cannot be differentiated symbolically."""
+        if not isinstance(self.loss, (SELoss, NLLLoss)):
+            return None
+        try:
+            return self.loss.model.jacobian(self.parameters.free.symbols)
+        except TypeError:
+            return None
+
+    def grad(self, x: np.ndarray) -> np.ndarray:
+        if self.jacobian is None:
+            raise ValueError(
+                "Gradients require a symbolic jacobian of the model of an SELoss or NLLLoss"
+            )
+        parameters = self.plan.unpack(x)
+        kwargs = {**parameters, **self.xdata, **self.fixed_values}
+        cotangents = self.loss.cotangents(self.outputs(x))  # type: ignore
+        gradient = self.jacobian.vjp(cotangents, **kwargs)
+
+        return self.plan.pack(gradient)
 
     def fit(self):
-        x = pack(self.parameters.free.guess.values())
-        result = minimize(self.func, x, bounds=scipy_bounds(self.parameters.free))
-        fit_parameters = unpack(result.x, self.fit_parameter_shapes)
+        # the packing layout and fixed values are frozen for the duration of the fit
+        self.plan = PackingPlan.from_parameters(self.parameters.free)
+        self.fixed_values = self.parameters.fixed.guess
+        self.bound_model = self.bind()
+        self.model_cache = EvaluationCache(self.evaluate)
+        x = self.plan.pack(self.parameters.free.guess)
+        jac = self.grad if self.jacobian is not None else None
+        result = minimize(self.func, x, jac=jac, bounds=scipy_bounds(self.parameters.free))
+        fit_parameters = self.plan.unpack(result.x)
 
         gof_qualifiers = {
             "loss": result["fun"],
@@ -32,7 +94,7 @@ class Minimize:  # = currently only scipy minimize
         std_error = {}
         if hasattr(self.loss, "y_data"):
             y_data = self.loss.y_data
-            ans = self.loss.model(**self.xdata, **fit_parameters, **self.parameters.fixed.guess)
+            ans = self.outputs(result.x)
             f = flat_concat({k: ans[k] for k in y_data})
             y = flat_concat(y_data)
 
@@ -51,13 +113,13 @@ class Minimize:  # = currently only scipy minimize
                     hess_inv = hess_inv.todense()
                 cov_mat = s_squared * hess_inv * 2
                 std_error_arr = np.sqrt(np.diag(cov_mat))
-                std_error = unpack(std_error_arr, self.fit_parameter_shapes)
+                std_error = self.plan.unpack(std_error_arr, fill_value=0.0)
 
         return Result(
             fit_parameters=fit_parameters,
             gof_qualifiers=gof_qualifiers,
             errors=std_error,
-            fixed_parameters=self.parameters.fixed.guess,
+            fixed_parameters=self.fixed_values,
             guess=self.parameters.free.guess,
             base_result=result,
         )
@@ -2,14 +2,21 @@ from __future__ import annotations
 
 import re
 from fnmatch import fnmatch
-from typing import Iterable, cast
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Iterable, NamedTuple, Sequence, cast
 
+import numpy as np
 import sympy as sp
 from toposort import toposort
 
-from smitfit.expr import Expr, _parse_subs_args, as_expr
+from smitfit.codegen import Backend, batched_evaluation, extract_constant_subexpressions, lambdify
+from smitfit.expr import Expr, SympyExpr, SympyMatrixExpr, _parse_subs_args, as_expr
 from smitfit.parameter import Parameter, Parameters
 from smitfit.typing import Numerical
+from smitfit.utils import align_batch, ensure_batch_axis
+
+if TYPE_CHECKING:
+    from smitfit.jacobian import Jacobian
 
 
 def parse_model_str(model: Iterable[str]) -> dict[sp.Symbol, sp.Expr]:
@@ -27,7 +34,23 @@ def parse_model_str(model: Iterable[str]) -> dict[sp.Symbol, sp.Expr]:
 
 
 class Model:
-    def __init__(self, model: dict[sp.Symbol, sp.Expr | Expr] | Iterable[str] | str) -> None:
+    """Collection of expressions, where each output symbol maps to an expression of other
+    symbols, which can include other outputs.
+
+    Args:
+        model: Dictionary of output symbol: expression or equations as string(s).
+        compiled: If `True`, all outputs are lowered into a single generated function with common
+            subexpressions eliminated across outputs. Requires all expressions to be sympy
+            expressions.
+        backend: Backend used to evaluate sympy expressions, "numpy" or "numba".
+    """
+
+    def __init__(
+        self,
+        model: dict[sp.Symbol, sp.Expr | Expr] | Iterable[str] | str,
+        compiled: bool = False,
+        backend: Backend = "numpy",
+    ) -> None:
         if isinstance(model, dict):
             self.model = cast(dict[sp.Symbol, sp.Expr | Expr], model)
         elif isinstance(model, str):
@@ -37,12 +60,24 @@ class Model:
         else:
             raise ValueError("Invalid type")
 
-        self.expr: dict = {k: as_expr(v) for k, v in self.model.items()}
-        topology = {k: v.symbols for k, v in self.expr.items()}
+        self.backend = backend
+        self.expr: dict = {k: as_expr(v, backend=backend) for k, v in self.model.items()}
+        self.topology = {k: v.symbols for k, v in self.expr.items()}
         self.call_stack = [
-            elem for subset in toposort(topology) for elem in subset if elem in self.model.keys()
+            elem
+            for subset in toposort(self.topology)
+            for elem in subset
+            if elem in self.model.keys()
         ]
 
+        self._partitions: dict[frozenset[str], tuple[list[Step], list[Step]]] = {}
+        self._jacobians: dict[frozenset[sp.Symbol], Jacobian] = {}
+        self.compiled = compiled
+        if compiled:
+            for v in self.expr.values():
+                if not isinstance(v, (SympyExpr, SympyMatrixExpr)):
+                    raise TypeError(f"Cannot compile expression of type {type(v).__name__!r}")
+
     @property
     def x_symbols(self) -> set[sp.Symbol]:
         return set.union(*(v.symbols for v in self.expr.values())) - self.y_symbols
@@ -51,12 +86,174 @@ class Model:
     def y_symbols(self) -> set[sp.Symbol]:
         return set(self.model.keys())
 
+    @cached_property
+    def arg_symbols(self) -> list[sp.Symbol]:
+        """Input symbols in the order of the arguments of `lambdified`"""
+        return sorted(self.x_symbols, key=str)
+
+    @cached_property
+    def dependencies(self) -> dict[sp.Symbol, set[sp.Symbol]]:
+        """Input symbols each output depends on, directly or through other outputs"""
+        dependencies: dict[sp.Symbol, set[sp.Symbol]] = {}
+        for key in self.call_stack:
+            dependencies[key] = set.union(
+                set(), *(dependencies.get(s, {s}) for s in self.topology[key])
+            )
+        return dependencies
+
+    @cached_property
+    def lambdified(self) -> Callable[..., tuple]:
+        """Single function evaluating all outputs in `call_stack` order from positional
+        arguments in `arg_symbols` order"""
+        inlined = inline_model(self)
+        return lambdify(
+            self.arg_symbols, [inlined[k] for k in self.call_stack], backend=self.backend
+        )
+
     def __call__(self, **kwargs):
+        if self.compiled:
+            try:
+                args = [kwargs[s.name] for s in self.arg_symbols]
+            except KeyError as e:
+                raise KeyError(f"Missing value for {e}") from e
+            return {k.name: v for k, v in zip(self.call_stack, self.lambdified(*args))}
+
         resolved = {}
         for key in self.call_stack:
             resolved[key.name] = self.expr[key](**kwargs, **resolved)
         return resolved
 
+    def call_batched(self, params: dict[str, Numerical], **kwargs) -> dict[str, np.ndarray]:
+        """Evaluate the model for a batch of parameter values in a single pass.
+
+        Args:
+            params: Batched values, each with a leading batch axis of the same size `K`.
+            **kwargs: Unbatched values (ie data), shared by all elements of the batch.
+
+        Returns:
+            Dictionary of outputs, each with a leading batch axis of size `K`.
+        """
+        size, expanded = align_batch(params, kwargs)
+        with batched_evaluation():
+            resolved = self(**{**kwargs, **expanded})
+        return {
+            k.name: ensure_batch_axis(
+                resolved[k.name], size, any(s.name in params for s in self.dependencies[k])
+            )
+            for k in self.call_stack
+        }
+
+    def select(self, outputs: Iterable[str | sp.Symbol]) -> Model:
+        """Returns a model which evaluates only `outputs` and the outputs they depend on.
+
+        Returns the model itself if all outputs are required.
+        """
+        names = {str(o) for o in outputs}
+        requested = [k for k in self.call_stack if k.name in names]
+        if missing := names - {k.name for k in requested}:
+            raise KeyError(f"Model has no output(s) {', '.join(sorted(missing))}")
+
+        required = set()
+        stack = requested
+        while stack:
+            key = stack.pop()
+            if key not in required:
+                required.add(key)
+                stack.extend(s for s in self.topology[key] if s in self.model)
+
+        if len(required) == len(self.model):
+            return self
+
+        model = {k: self.expr[k] for k in self.call_stack if k in required}
+        return Model(model, compiled=self.compiled, backend=self.backend)
+
+    def partition(self, constant: frozenset[str]) -> tuple[list[Step], list[Step]]:
+        """Partition the evaluation of the model in steps which depend only on the inputs in
+        `constant` and steps which have to be evaluated on each call.
+
+        Outputs which depend only on constant inputs are evaluated once, and constant
+        subexpressions of sympy expressions are extracted and evaluated once.
+
+        Args:
+            constant: Names of inputs which do not change between calls, e.g. data.
+
+        Returns:
+            Tuple of steps to evaluate once and steps to evaluate on each call.
+        """
+        if constant not in self._partitions:
+            if self.compiled:
+                self._partitions[constant] = self._partition_compiled(constant)
+            else:
+                self._partitions[constant] = self._partition(constant)
+        return self._partitions[constant]
+
+    def jacobian(self, symbols: Iterable[sp.Symbol]) -> Jacobian:
+        """Symbolic jacobian of the model's outputs with respect to `symbols`, cached per set of
+        symbols. See `smitfit.jacobian.Jacobian`."""
+        from smitfit.jacobian import Jacobian
+
+        key = frozenset(symbols)
+        if key not in self._jacobians:
+            self._jacobians[key] = Jacobian(self, key)
+        return self._jacobians[key]
+
+    def _partition(self, constant: frozenset[str]) -> tuple[list[Step], list[Step]]:
+        constant = set(constant)
+        precompute, steps = [], []
+        for i, key in enumerate(self.call_stack):
+            expr = self.expr[key]
+            args = [s.name for s in expr.arg_symbols]
+            if all(name in constant for name in args):
+                precompute.append(Step([key.name], expr.call_positional, args))
+                constant.add(key.name)
+                continue
+
+            if isinstance(expr, (SympyExpr, SympyMatrixExpr)):
+                (reduced,), subexpressions = extract_constant_subexpressions(
+                    [expr.expr], constant, prefix=f"_precomputed_{i}"
+                )
+                if subexpressions:
+                    sub_args = sorted(
+                        set().union(*(v.free_symbols for v in subexpressions.values())), key=str
+                    )
+                    func = lambdify(sub_args, list(subexpressions.values()), backend=self.backend)
+                    precompute.append(
+                        Step(
+                            [s.name for s in subexpressions], func, [s.name for s in sub_args], True
+                        )
+                    )
+                    expr = type(expr)(reduced, backend=expr.backend)
+                    args = [s.name for s in expr.arg_symbols]
+
+            steps.append(Step([key.name], expr.call_positional, args))
+
+        return precompute, steps
+
+    def _partition_compiled(self, constant: frozenset[str]) -> tuple[list[Step], list[Step]]:
+        inlined = inline_model(self)
+        exprs = [inlined[k] for k in self.call_stack]
+        reduced, subexpressions = extract_constant_subexpressions(exprs, set(constant))
+        if not subexpressions:
+            args = [s.name for s in self.arg_symbols]
+            return [], [Step([k.name for k in self.call_stack], self.lambdified, args, True)]
+
+        sub_args = sorted(set().union(*(v.free_symbols for v in subexpressions.values())), key=str)
+        func = lambdify(sub_args, list(subexpressions.values()), backend=self.backend)
+        precompute = Step([s.name for s in subexpressions], func, [s.name for s in sub_args], True)
+
+        args = sorted(set().union(*(e.free_symbols for e in reduced)), key=str)
+        func = lambdify(args, reduced, backend=self.backend)
+        step = Step([k.name for k in self.call_stack], func, [s.name for s in args], True)
+
+        return [precompute], [step]
+
+    def bind(self, names: Sequence[str], **kwargs) -> BoundModel:
+        """Bind values in `kwargs` (data, fixed parameters) to the model's inputs.
+
+        Returns a `BoundModel` which takes values for `names` as positional arguments.
+        """
+        return BoundModel(self, names, **kwargs)
+
     # TODO copy/paste code with Function -> baseclass
     def define_parameters(
         self, parameters: dict[str, Numerical] | Iterable[str] | str = "*"
@@ -92,7 +289,89 @@ class Model:
 
             new_model[symbol] = new_expr
 
-        return Model(new_model)
+        return Model(new_model, compiled=self.compiled, backend=self.backend)
+
+
+class Step(NamedTuple):
+    """Evaluation of one or more model outputs from values of `args`"""
+
+    outputs: list[str]
+    func: Callable
+    args: list[str]
+    multi: bool = False  # `func` returns a tuple of values for all `outputs`
+
+
+class BoundModel:
+    """Model with a subset of its inputs bound to fixed values.
+
+    The argument layout of all expressions is resolved at construction, such that calls take
+    values for `names` as positional arguments and do not need to match symbol names.
+
+    Outputs and subexpressions which depend only on bound values (data, fixed parameters) are
+    evaluated once at construction.
+
+    Args:
+        model: Model to bind.
+        names: Names of the inputs which are given as positional arguments on call.
+        **kwargs: Values of all other inputs.
+    """
+
+    def __init__(self, model: Model, names: Sequence[str], **kwargs) -> None:
+        self.model = model
+        self.names = list(names)
+
+        bound = {k: v for k, v in kwargs.items() if k not in self.names}
+        precompute, steps = model.partition(frozenset(bound))
+
+        constants = dict(bound)
+        for step in precompute:
+            values = step.func(*_get_values(constants, step.args))
+            constants.update(zip(step.outputs, values if step.multi else [values]))
+
+        # values are stored in slots; call values first, then constants, then outputs
+        self._constants = list(constants.values())
+        index = {name: i for i, name in enumerate(self.names + list(constants))}
+
+        self._plan: list[tuple[Callable, list[int], bool]] = []
+        for step in steps:
+            self._plan.append((step.func, _get_values(index, step.args), step.multi))
+            for name in step.outputs:
+                index[name] = len(index)
+
+        self._output_index = [(k.name, index[k.name]) for k in model.call_stack]
+
+    def __call__(self, *values) -> dict[str, Any]:
+        slots = list(values) + self._constants
+        for func, idx, multi in self._plan:
+            if multi:
+                slots.extend(func(*(slots[i] for i in idx)))
+            else:
+                slots.append(func(*(slots[i] for i in idx)))
+
+        return {name: slots[i] for name, i in self._output_index}
+
+
+def _get_values(d: dict[str, Any], keys: Iterable[str]) -> list[Any]:
+    try:
+        return [d[k] for k in keys]
+    except KeyError as e:
+        raise KeyError(f"Missing value for {e}") from e
+
+
+def inline_model(model: Model) -> dict[sp.Symbol, sp.Expr | sp.MatrixBase]:
+    """Substitute outputs of `model` which are used as inputs of other outputs, such that
+    each output is expressed in terms of `x_symbols` only.
+
+    Raises a `TypeError` when the model contains expressions which are not sympy based.
+    """
+    inlined = {}
+    for y in model.call_stack:
+        expr = model.expr[y]
+        if not isinstance(expr, (SympyExpr, SympyMatrixExpr)):
+            raise TypeError(f"Cannot inline expression of type {type(expr).__name__!r}")
+        inlined[y] = expr.expr.subs(inlined) if inlined else expr.expr
+
+    return inlined
 
 
 def _define_parameters(
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal, Optional
+
+import numpy as np
+from scipy.stats import qmc
+
+from smitfit.codegen import generate_code
+from smitfit.loss import Loss
+from smitfit.minimize import Minimize
+from smitfit.parameter import PackingPlan, Parameters
+from smitfit.result import Result
+
+Sampling = Literal["random", "latin"]
+
+
+def sample_starts(
+    parameters: Parameters,
+    n: int,
+    sampling: Sampling = "random",
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """Draw packed starting points for the free elements of `parameters` within their bounds.
+
+    Elements bounded on both sides are sampled between their bounds. Other elements are sampled
+    within +/- the magnitude of their guess (or 1 if the guess is zero), clipped to the bounds.
+
+    Args:
+        parameters: Parameters to sample.
+        n: Number of starting points.
+        sampling: "random" for uniform random sampling, "latin" for latin hypercube sampling.
+        rng: Random number generator.
+
+    Returns:
+        Array of shape (n, number of free elements).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    free = parameters.free
+    plan = PackingPlan.from_parameters(free)
+
+    guess = plan.pack(free.guess)
+    lower = plan.pack(
+        {
+            p.name: np.broadcast_to(-np.inf if p.lower_bound is None else p.lower_bound, p.shape)
+            for p in free
+        }
+    )
+    upper = plan.pack(
+        {
+            p.name: np.broadcast_to(np.inf if p.upper_bound is None else p.upper_bound, p.shape)
+            for p in free
+        }
+    )
+
+    width = np.where(guess != 0, np.abs(guess), 1.0)
+    bounded = np.isfinite(lower) & np.isfinite(upper)
+    lo = np.where(bounded, lower, np.maximum(lower, guess - width))
+    hi = np.where(bounded, upper, np.minimum(upper, guess + width))
+
+    if sampling == "random":
+        unit = rng.random((n, len(plan)))
+    elif sampling == "latin":
+        unit = qmc.LatinHypercube(d=len(plan), rng=rng).random(n)
+    else:
+        raise ValueError(f"Invalid sampling {sampling!r}, must be 'random' or 'latin'")
+
+    return lo + unit * (hi - lo)
+
+
+class MultiStart:
+    """Repeat a fit from multiple starting points, in parallel over a process pool.
+
+    Code for the model (and its jacobian) is generated once in the parent process. Workers
+    receive the fitter once, when the pool starts, and only compile the generated source.
+
+    Args:
+        loss: Loss to minimize.
+        parameters: Parameters to fit, starting points are sampled within their bounds.
+        xdata: Values of the model's independent variables.
+        n_starts: Number of starting points.
+        sampling: "random" or "latin" (latin hypercube) sampling of starting points.
+        fitter: Fitter class, taking `loss`, `parameters` and `xdata`, ie `Minimize` or
+            `LeastSquares`.
+        max_workers: Number of worker processes. If 1, fits are run in the current process.
+        seed: Seed for sampling starting points.
+    """
+
+    def __init__(
+        self,
+        loss: Loss,
+        parameters: Parameters,
+        xdata: dict[str, np.ndarray],
+        n_starts: int = 10,
+        sampling: Sampling = "random",
+        fitter: type = Minimize,
+        max_workers: Optional[int] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.loss = loss
+        self.parameters = parameters
+        self.xdata = xdata
+        self.n_starts = n_starts
+        self.sampling = sampling
+        self.fitter = fitter
+        self.max_workers = max_workers
+        self.seed = seed
+
+    def starts(self) -> np.ndarray:
+        """Packed starting points, of shape (n_starts, number of free elements)"""
+        rng = np.random.default_rng(self.seed)
+        return sample_starts(self.parameters, self.n_starts, self.sampling, rng=rng)
+
+    def prepare(self):
+        """Create the fitter and generate code for the model and its jacobian"""
+        fitter = self.fitter(self.loss, self.parameters.copy(), self.xdata)
+        generate_code(fitter)
+
+        return fitter
+
+    def fit(self) -> list[Result]:
+        """Run the fits.
+
+        Fits which raise an error are recorded as failed results, with infinite loss, NaN
+        parameter values and the error in `metadata["error"]`.
+
+        Returns:
+            Results of all fits, ranked by loss (lowest first).
+
+        Raises:
+            RuntimeError: If all fits failed.
+        """
+        starts = self.starts()
+        fitter = self.prepare()
+
+        if self.max_workers == 1:
+            results = [_fit_from(fitter, x0) for x0 in starts]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(pickle.dumps(fitter),),
+            ) as executor:
+                results = list(executor.map(_fit_start, starts))
+
+        if all("error" in r.metadata for r in results):
+            raise RuntimeError(f"All fits failed, first error: {results[0].metadata['error']}")
+
+        return sorted(results, key=lambda r: r.gof_qualifiers["loss"])
+
+
+def _fit_from(fitter, x0: np.ndarray) -> Result:
+    plan = PackingPlan.from_parameters(fitter.parameters.free)
+    guess = plan.unpack(x0)
+    fitter.parameters.set_guesses({k: v.copy() for k, v in guess.items()})
+    try:
+        return fitter.fit()
+    except Exception as e:
+        return Result(
+            fit_parameters={k: np.full_like(v, np.nan) for k, v in guess.items()},
+            gof_qualifiers={"loss": np.inf},
+            fixed_parameters=fitter.fixed_values,
+            guess=guess,
+            metadata={"error": f"{type(e).__name__}: {e}"},
+        )
+
+
+# fitter of the current worker process
+_worker_fitter = None
+
+
+def _init_worker(payload: bytes) -> None:
+    global _worker_fitter
+    _worker_fitter = pickle.loads(payload)
+
+
+def _fit_start(x0: np.ndarray) -> Result:
+    return _fit_from(_worker_fitter, x0)
@@ -19,7 +19,8 @@ class Parameter:
     guess: Numerical = 1.0
     lower_bound: Optional[Numerical] = None
     upper_bound: Optional[Numerical] = None
-    fixed: bool = False  # TODO fixed per array element?
+    fixed: bool | npt.NDArray[np.bool_] = False
+    """Whether the parameter is fixed, or a boolean mask of fixed elements for array parameters"""
 
     @property
     def symbol(self) -> sp.Symbol:
@@ -34,9 +35,26 @@ class Parameter:
     def bounds(self) -> tuple[Optional[Numerical], Optional[Numerical]]:
         return self.lower_bound, self.upper_bound
 
-    def fix(self) -> Parameter:
-        """Fix the parameter at its current guess value"""
-        self.fixed = True
+    @property
+    def is_fixed(self) -> bool:
+        """`True` if all elements of the parameter are fixed"""
+        return bool(np.all(self.fixed))
+
+    @property
+    def free_mask(self) -> Optional[np.ndarray]:
+        """Boolean mask of free elements, or `None` if `fixed` is not a mask"""
+        if np.ndim(self.fixed) == 0:
+            return None
+        return ~np.broadcast_to(np.asarray(self.fixed, dtype=bool), self.shape)
+
+    def fix(self, mask: Optional[npt.ArrayLike] = None) -> Parameter:
+        """Fix the parameter at its current guess value
+
+        Args:
+            mask: Optional boolean mask of elements to fix, for array parameters. Other elements
+                remain free.
+        """
+        self.fixed = True if mask is None else np.asarray(mask, dtype=bool)
         return self
 
     def unfix(self) -> Parameter:
@@ -161,12 +179,12 @@ class Parameters:
     @property
     def fixed(self) -> Parameters:
         """Get list of fixed parameters"""
-        return Parameters([p for p in self._parameters.values() if p.fixed])
+        return Parameters([p for p in self._parameters.values() if p.is_fixed])
 
     @property
     def free(self) -> Parameters:
-        """Get list of free parameters"""
-        return Parameters([p for p in self._parameters.values() if not p.fixed])
+        """Get list of free parameters, including parameters with some fixed elements"""
+        return Parameters([p for p in self._parameters.values() if not p.is_fixed])
 
     def to_list(self) -> list[Parameter]:
         """Convert to parameter list"""
@@ -201,6 +219,105 @@ class Parameters:
         return f"Parameters({list(self._parameters.values())})"
 
 
+class PackingPlan:
+    """Precomputed layout of parameters packed into a 1D array.
+
+    Unpacking returns views of the packed array via precomputed slices. Parameters with a mask
+    of free elements only pack their free elements, and are unpacked into full arrays with the
+    fixed elements taken from `values`.
+
+    Args:
+        shapes: Parameter name: shape, in the order of packing.
+        masks: Optional parameter name: boolean mask of free elements.
+        values: Parameter name: values of the full arrays, required for masked parameters.
+    """
+
+    def __init__(
+        self,
+        shapes: dict[str, tuple[int, ...]],
+        masks: Optional[dict[str, np.ndarray]] = None,
+        values: Optional[dict[str, Numerical]] = None,
+    ) -> None:
+        self.shapes = dict(shapes)
+        self.masks = {k: np.broadcast_to(v, self.shapes[k]) for k, v in (masks or {}).items()}
+        self.values = {
+            k: np.broadcast_to(np.asarray((values or {})[k], dtype=float), self.shapes[k])
+            for k in self.masks
+        }
+
+        sizes = [
+            int(self.masks[k].sum()) if k in self.masks else int(np.prod(shape))
+            for k, shape in self.shapes.items()
+        ]
+        offsets = np.cumsum([0] + sizes)
+        self.slices = {
+            name: slice(int(start), int(stop))
+            for name, start, stop in zip(self.shapes, offsets[:-1], offsets[1:])
+        }
+        self.size = int(offsets[-1])
+        self._items = [
+            (name, self.slices[name], shape, self.masks.get(name))
+            for name, shape in self.shapes.items()
+        ]
+
+        # packed index of each element, -1 for fixed elements
+        self.indices: dict[str, np.ndarray] = {}
+        for name, sl, shape, mask in self._items:
+            index = np.full(shape, -1, dtype=int)
+            if mask is None:
+                index[...] = np.arange(sl.start, sl.stop).reshape(shape)
+            else:
+                index[mask] = np.arange(sl.start, sl.stop)
+            self.indices[name] = index
+
+    @classmethod
+    def from_parameters(cls, parameters: Parameters) -> PackingPlan:
+        """Plan for the free elements of `parameters`, with the guesses of fixed elements"""
+        masks = {p.name: mask for p in parameters if (mask := p.free_mask) is not None}
+        values = {name: parameters[name].guess for name in masks}
+        return cls(parameters.shapes, masks, values)
+
+    @property
+    def free_index(self) -> np.ndarray:
+        """Positions of the packed elements among all elements of all parameters"""
+        full = np.concatenate([index.ravel() for index in self.indices.values()] + [[]])
+        return np.flatnonzero(full >= 0)
+
+    def unpack(self, x: np.ndarray, fill_value: Optional[float] = None) -> dict[str, np.ndarray]:
+        """Unpack `x` into views of its elements in the shape of each parameter.
+
+        Args:
+            x: Packed values.
+            fill_value: Value for fixed elements of masked parameters, defaults to `values`.
+        """
+        x = np.asarray(x)
+        out = {}
+        for name, sl, shape, mask in self._items:
+            if mask is None:
+                out[name] = x[sl].reshape(shape)
+            else:
+                if fill_value is None:
+                    full = self.values[name].astype(np.result_type(x, float))
+                else:
+                    full = np.full(shape, fill_value, dtype=np.result_type(x, float))
+                full[mask] = x[sl]
+                out[name] = full
+        return out
+
+    def pack(self, parameter_values: dict[str, Numerical]) -> np.ndarray:
+        """Pack (the free elements of) parameter values into a new 1D array"""
+        out = np.empty(self.size)
+        for name, sl, shape, mask in self._items:
+            if mask is None:
+                out[sl] = np.ravel(parameter_values[name])
+            else:
+                out[sl] = np.broadcast_to(parameter_values[name], shape)[mask]
+        return out
+
+    def __len__(self) -> int:
+        return self.size
+
+
 def unpack(x: npt.ArrayLike, shapes: dict[str, tuple[int, ...]]) -> dict[str, np.ndarray]:
     """Unpack a ndim 1 array of concatenated parameter values into a dictionary of
     parameter name: parameter_value where parameter values are cast back to their
@@ -225,7 +342,8 @@ def pack(
 def scipy_bounds(parameters: Parameters) -> Optional[Bounds]:
     lb, ub = [], []
     for p in parameters:
-        size = np.prod(p.shape, dtype=int)
+        mask = p.free_mask
+        size = np.prod(p.shape, dtype=int) if mask is None else int(mask.sum())
         lb += [p.lower_bound] * size
         ub += [p.upper_bound] * size
 
@@ -2,7 +2,7 @@ from functools import partial
 import numpy as np
 
 from smitfit.parameter import pack, unpack
-from smitfit.expr import as_expr
+from smitfit.expr import as_expr, bind
 
 
 class Root:
@@ -29,11 +29,12 @@ class Root:
     def func(self):
         unpack_x0 = partial(unpack, shapes={k: (1,) for k in self.guess})
 
-        def unpack_args(args):
-            return {n: arg for n, arg in zip(self.params, args)}
+        # argument layout is resolved once, x0 and args are passed positionally
+        names = list(self.guess) + list(self.params)
+        bound = [bind(e, names) for e in self.expr]
 
         def callable(x0, *args):
-            ans = [e(**unpack_x0(x0), **unpack_args(args)) for e in self.expr]
+            ans = [b(*unpack_x0(x0).values(), *args) for b in bound]
             return np.concatenate([arr.flatten() for arr in ans])
 
         return callable
@@ -12,6 +12,60 @@ def flat_concat(data: dict[str, np.ndarray]) -> np.ndarray:
     return np.concatenate([arr.flatten() for arr in data.values()])
 
 
+def sum_to_shape(arr: np.ndarray, shape: tuple[int, ...]) -> np.ndarray:
+    """Sum a broadcasted array `arr` back to `shape`, the inverse of broadcasting."""
+    arr = np.broadcast_to(arr, np.broadcast_shapes(np.shape(arr), shape))
+    n_lead = arr.ndim - len(shape)
+    axes = tuple(range(n_lead)) + tuple(
+        n_lead + i for i, size in enumerate(shape) if size == 1 and arr.shape[n_lead + i] != 1
+    )
+    return arr.sum(axis=axes).reshape(shape)
+
+
+def align_batch(
+    params: dict[str, Any], kwargs: dict[str, Any]
+) -> tuple[int, dict[str, np.ndarray]]:
+    """Expand the batched values in `params` such that their leading batch axis broadcasts
+    against the unbatched values in `kwargs`.
+
+    Each value in `params` has shape `(K, *shape)`. Singleton axes are inserted after the batch
+    axis such that all values have the same number of dimensions.
+
+    Returns:
+        Tuple of the batch size `K` and the expanded values.
+    """
+    arrays = {k: np.asarray(v) for k, v in params.items()}
+    sizes = {arr.shape[0] if arr.ndim else None for arr in arrays.values()}
+    if len(sizes) != 1 or None in sizes:
+        raise ValueError("Batched values must have a leading batch axis of equal size")
+    (size,) = sizes
+
+    ndim = max(
+        [np.ndim(v) for v in kwargs.values()] + [arr.ndim - 1 for arr in arrays.values()],
+        default=0,
+    )
+    expanded = {
+        k: arr.reshape((size,) + (1,) * (ndim - arr.ndim + 1) + arr.shape[1:])
+        for k, arr in arrays.items()
+    }
+    return size, expanded
+
+
+def ensure_batch_axis(arr: Any, size: int, batched: bool) -> np.ndarray:
+    """Prepend a batch axis of length `size` to `arr` for outputs which do not depend on batched
+    values.
+
+    Args:
+        arr: Output array, evaluated within `codegen.batched_evaluation`.
+        size: Size of the batch axis.
+        batched: Whether `arr` depends on batched values, such that it has its batch axis.
+    """
+    arr = np.asarray(arr)
+    if batched:
+        return arr
+    return np.broadcast_to(arr, (size,) + arr.shape)
+
+
 def clean_types(d: Any) -> Any:
     """cleans up nested dict/list/tuple/other `d` for exporting as yaml
 
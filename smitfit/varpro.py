@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+from scipy.optimize import Bounds, least_squares
+
+from smitfit.least_squares import LeastSquares
+from smitfit.linear import linear_parameters
+from smitfit.loss import SELoss
+from smitfit.memoize import EvaluationCache
+from smitfit.parameter import Parameters, scipy_bounds
+from smitfit.result import Result
+
+
+class Projection(NamedTuple):
+    """Solution of the linear parameters for fixed nonlinear parameters"""
+
+    x: np.ndarray
+    """Packed free parameters, with the linear parameters at their optimum"""
+
+    residuals: np.ndarray
+    """Residuals at `x`"""
+
+    basis: np.ndarray
+    """Orthonormal basis of the column space of the jacobian with respect to the linear
+    parameters"""
+
+
+class VarPro(LeastSquares):
+    """Variable projection fit of models which are linear in a subset of their parameters.
+
+    The linear parameters are solved by linear least squares for every evaluation of the
+    residuals, such that `scipy.optimize.least_squares` only optimizes the nonlinear parameters.
+    The jacobian of the projected residuals uses Kaufman's approximation. Errors are computed
+    from the jacobian with respect to all free parameters.
+
+    Args:
+        loss: Squared error loss (`SELoss` or `MSELoss`).
+        parameters: Parameters to fit.
+        xdata: Values of the model's independent variables.
+        linear: Names of the parameters which enter the model linearly. By default, these are
+            derived from the symbolic jacobian of the model. Linear parameters cannot have
+            bounds.
+    """
+
+    def __init__(
+        self,
+        loss: SELoss,
+        parameters: Parameters,
+        xdata: dict[str, np.ndarray],
+        linear: Optional[Iterable[str]] = None,
+    ):
+        super().__init__(loss, parameters, xdata)
+        self._linear = None if linear is None else list(linear)
+        self.linear_index = np.array([], dtype=int)
+        self.nonlinear_index = np.arange(len(self.plan))
+        self.x_linear = np.array([])
+        self.projection_cache: Optional[EvaluationCache[Projection]] = None
+
+    @cached_property
+    def linear(self) -> list[str]:
+        """Names of the linear parameters"""
+        if self.jacobian is None:
+            raise ValueError("Variable projection requires the symbolic jacobian of the residuals")
+
+        free = {p.name: p for p in self.parameters.free}
+        if self._linear is None:
+            candidates = [
+                p.symbol for p in free.values() if p.lower_bound is None and p.upper_bound is None
+            ]
+            return [s.name for s in linear_parameters(self.jacobian, candidates)]
+
+        for name in self._linear:
+            if name not in free:
+                raise ValueError(f"Linear parameter {name!r} is not a free parameter")
+            if free[name].lower_bound is not None or free[name].upper_bound is not None:
+                raise ValueError(f"Linear parameter {name!r} cannot have bounds")
+
+        symbols = [free[name].symbol for name in self._linear]
+        if len(linear_parameters(self.jacobian, symbols)) != len(symbols):
+            raise ValueError(f"Model is not linear in parameters {self._linear}")
+
+        return sorted(self._linear)
+
+    def setup(self) -> None:
+        super().setup()
+        indices = [self.plan.indices[name] for name in self.linear]
+        self.linear_index = np.sort(
+            np.concatenate([i[i >= 0].ravel() for i in indices] + [np.array([], dtype=int)])
+        )
+        self.nonlinear_index = np.setdiff1d(np.arange(len(self.plan)), self.linear_index)
+        self.projection_cache = EvaluationCache(self.project)
+
+    def project(self, x_nonlinear: np.ndarray) -> Projection:
+        """Solve the linear parameters for the packed nonlinear parameters `x_nonlinear`"""
+        x = np.empty(len(self.plan))
+        x[self.nonlinear_index] = x_nonlinear
+        x[self.linear_index] = self.x_linear
+
+        # residuals are linear in the linear parameters: r = r0 + A dx
+        r0 = self.residuals(x)
+        A = self.jac(x, parameters=self.linear)[:, self.linear_index]
+        U, singular_values, Vt = np.linalg.svd(A, full_matrices=False)
+        rank = np.sum(singular_values > singular_values[:1] * max(A.shape) * np.finfo(float).eps)
+        U, singular_values, Vt = U[:, :rank], singular_values[:rank], Vt[:rank]
+
+        coefficients = U.T @ r0
+        x[self.linear_index] -= Vt.T @ (coefficients / singular_values)
+
+        return Projection(x, r0 - U @ coefficients, U)
+
+    def projected(self, x_nonlinear: np.ndarray) -> Projection:
+        """Projection at `x_nonlinear`, from `projection_cache` if available"""
+        if self.projection_cache is None:
+            return self.project(x_nonlinear)
+        return self.projection_cache(x_nonlinear)
+
+    def projected_residuals(self, x_nonlinear: np.ndarray) -> np.ndarray:
+        """Residuals at the nonlinear parameters `x_nonlinear` and optimal linear parameters"""
+        return self.projected(x_nonlinear).residuals
+
+    def projected_jac(self, x_nonlinear: np.ndarray) -> np.ndarray:
+        """Jacobian of `projected_residuals` (Kaufman's approximation)"""
+        projection = self.projected(x_nonlinear)
+        nonlinear = [name for name in self.fit_parameter_shapes if name not in self.linear]
+        J = self.jac(projection.x, parameters=nonlinear)[:, self.nonlinear_index]
+        return J - projection.basis @ (projection.basis.T @ J)
+
+    def fit(self, **kwargs) -> Result:
+        """Run the fit.
+
+        Args:
+            **kwargs: Additional keyword arguments passed to `scipy.optimize.least_squares`.
+        """
+        self.setup()
+        x = self.plan.pack(self.parameters.free.guess)
+        self.x_linear = x[self.linear_index]
+        x_nonlinear = x[self.nonlinear_index]
+
+        if len(x_nonlinear) == 0:
+            result = None
+        else:
+            bounds = scipy_bounds(self.parameters.free)
+            if bounds is not None:
+                lb = np.broadcast_to(bounds.lb, x.shape)[self.nonlinear_index]
+                ub = np.broadcast_to(bounds.ub, x.shape)[self.nonlinear_index]
+                bounds = Bounds(lb, ub)
+
+            result = least_squares(
+                self.projected_residuals,
+                x_nonlinear,
+                jac=self.projected_jac,
+                bounds=bounds if bounds is not None else (-np.inf, np.inf),
+                **kwargs,
+            )
+            x_nonlinear = result.x
+
+        projection = self.projected(x_nonlinear)
+        J = self.jac(projection.x)
+
+        return self.make_result(projection.x, projection.residuals, J, base_result=result)
@@ -0,0 +1,71 @@
+import os
+import time
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from smitfit import cache, codegen
+from smitfit.expr import SympyExpr
+
+
+@pytest.fixture
+def source_cache(tmp_path):
+    yield cache.enable_cache(tmp_path / "cache")
+    cache.disable_cache()
+
+
+def test_cache_roundtrip(source_cache, monkeypatch):
+    a, x = sp.symbols("a x")
+    assert SympyExpr(a * sp.exp(x))(a=2.0, x=0.0) == 2.0
+    assert len(source_cache) == 1
+
+    # argument order is part of the key
+    codegen.lambdify([x, a], a * sp.exp(x))
+    assert len(source_cache) == 2
+
+    def raise_error(*args, **kwargs):
+        raise AssertionError("source should be loaded from cache")
+
+    monkeypatch.setattr(codegen, "generate_source", raise_error)
+    assert SympyExpr(a * sp.exp(x))(a=3.0, x=0.0) == 3.0
+
+    # new symbols with the same names yield the same key
+    b, y = sp.symbols("b y")
+    assert codegen.source_key([b, y], b * sp.exp(y)) == codegen.source_key([a, x], a * sp.exp(x))
+
+
+def test_cache_eviction(tmp_path):
+    source_cache = cache.SourceCache(tmp_path, max_size=100)
+    source_cache.put("first", "a" * 40)
+    source_cache.put("second", "b" * 40)
+    os.utime(tmp_path / "first.py", (1000, 1000))
+    os.utime(tmp_path / "second.py", (2000, 2000))
+    source_cache.put("third", "c" * 40)
+
+    assert source_cache.get("first") is None
+    assert source_cache.get("second") == "b" * 40
+    assert source_cache.get("third") == "c" * 40
+    assert source_cache.size == 80
+
+    # the entry just written is kept, also if other entries have equal or later mtimes
+    future = time.time() + 1000
+    os.utime(tmp_path / "second.py", (future, future))
+    os.utime(tmp_path / "third.py", (future, future))
+    source_cache.put("fourth", "d" * 40)
+    assert source_cache.get("fourth") == "d" * 40
+    assert len(source_cache) == 2
+
+    cache.clear_cache(tmp_path)
+    assert len(source_cache) == 0
+
+
+def test_cache_matrix(source_cache):
+    k, t = sp.symbols("k t")
+    m = sp.Matrix([[-k, 0], [k, sp.exp(-k * t)]])
+    f1 = codegen.lambdify([k, t], m)
+    f2 = codegen.lambdify([k, t], m)
+    t_arr = np.linspace(0, 1, num=3)
+
+    assert len(source_cache) == 1
+    assert np.allclose(f1(0.5, t_arr), f2(0.5, t_arr))
@@ -0,0 +1,71 @@
+import numpy as np
+import sympy as sp
+
+from smitfit.codegen import generate_source, lambdify
+from smitfit.expr import SympyMatrixExpr
+from smitfit.model import Model
+from smitfit.symbol import Symbols
+
+
+def test_lambdify_cse():
+    x, a, b = sp.symbols("x a b")
+    exprs = [a * sp.exp(-(x**2)), b * sp.exp(-(x**2))]
+    source = generate_source([a, b, x], exprs)
+    assert source.count("numpy.exp") == 1
+
+    x_arr = np.linspace(-1, 1, num=10)
+    y1, y2 = lambdify([a, b, x], exprs)(2.0, 3.0, x_arr)
+    assert np.allclose(y1, 2.0 * np.exp(-(x_arr**2)))
+    assert np.allclose(y2, 3.0 * np.exp(-(x_arr**2)))
+
+
+def test_compiled_model():
+    s = Symbols("x y z mu sigma a1 a2")
+    norm = sp.exp(-(((s.x - s.mu) / s.sigma) ** 2)) / s.sigma
+    model_dict = {s.y: s.a1 * norm, s.z: s.a2 * norm + s.y}  # type: ignore
+
+    model = Model(model_dict)
+    compiled = Model(model_dict, compiled=True)
+    assert compiled.compiled
+
+    kwargs = {"x": np.linspace(-2, 2, num=20), "mu": 0.2, "sigma": 0.5, "a1": 2.0, "a2": 3.0}
+    expected = model(**kwargs)
+    result = compiled(**kwargs)
+    assert result.keys() == expected.keys()
+    for k in expected:
+        assert np.allclose(result[k], expected[k])
+
+    assert compiled.subs(a1=1.0).compiled
+
+
+def test_compiled_matrix_model():
+    a, b, t = sp.symbols("a b t")
+    model_dict = {sp.Symbol("m"): sp.Matrix([[a * t, b], [0, 1]])}
+
+    model = Model(model_dict)
+    compiled = Model(model_dict, compiled=True)
+
+    for t_value in [np.linspace(0, 1, num=5), 2.0]:
+        expected = model(a=2.0, b=3.0, t=t_value)["m"]
+        result = compiled(a=2.0, b=3.0, t=t_value)["m"]
+        assert result.shape == expected.shape
+        assert np.allclose(result, expected)
+
+
+def test_matrix_expr_single_kernel():
+    k, t = sp.symbols("k t")
+    m = sp.Matrix([[sp.exp(-k * t), 0, 1], [0, 2 * sp.exp(-k * t), k]])
+    expr = SympyMatrixExpr(m)
+    assert expr.lambdified.__name__ == "_lambdified"
+
+    t_arr = np.linspace(0, 1, num=4)
+    out = expr(k=0.5, t=t_arr)
+    assert out.shape == (4, 2, 3)
+    for i, j in np.ndindex(m.shape):
+        expected = sp.lambdify([k, t], m[i, j])(0.5, t_arr)
+        assert np.allclose(out[:, i, j], expected)
+
+    # elements are independent copies of the constant template
+    out[0, 0, 1] = 10.0
+    assert expr(k=0.5, t=t_arr)[0, 0, 1] == 0.0
+    assert expr(k=0.5, t=1.0).shape == (2, 3)
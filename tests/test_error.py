@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import sympy as sp
+
+from smitfit.error import Bootstrap, stack_parameters
+from smitfit.loss import NLLLoss, SELoss
+from smitfit.minimize import Minimize
+from smitfit.model import Model
+from smitfit.symbol import Symbols
+
+
+@pytest.fixture
+def linear_fit():
+    s = Symbols("x y a b")
+    model = Model({s.y: s.a * s.x + s.b})  # type: ignore
+    rng = np.random.default_rng(43)
+    xdata = {"x": np.linspace(0, 11, num=50)}
+    ydata = {"y": 0.15 * xdata["x"] + 2.5 + rng.normal(0, 0.3, size=50)}
+    parameters = model.define_parameters("a b")
+    loss = SELoss(model, ydata)
+    result = Minimize(loss, parameters, xdata).fit()
+
+    return loss, parameters, xdata, result
+
+
+@pytest.mark.parametrize("mode", ["parametric", "nonparametric"])
+def test_bootstrap_reproducible(linear_fit, mode):
+    loss, parameters, xdata, result = linear_fit
+    kwargs = dict(mode=mode, n_boot=8, seed=1)
+    y_data = loss.y_data["y"].copy()
+
+    serial = Bootstrap(loss, parameters, xdata, result, executor="serial", **kwargs).fit()
+    samples = stack_parameters(serial)
+    assert samples["a"].shape == (8,)
+    assert np.std(samples["a"]) > 0
+    assert np.allclose(np.mean(samples["a"]), result.parameters["a"], atol=0.02)
+
+    for executor, workers in [("thread", 3), ("process", 2)]:
+        results = Bootstrap(
+            loss, parameters, xdata, result, executor=executor, max_workers=workers, **kwargs
+        ).fit()
+        for k, v in stack_parameters(results).items():
+            assert np.allclose(v, samples[k])
+
+    # the original loss and parameters are not modified
+    assert np.array_equal(loss.y_data["y"], y_data)
+    assert parameters["a"].guess == 1.0
+
+
+def test_bootstrap_resample(linear_fit):
+    loss, parameters, xdata, result = linear_fit
+    xdata = xdata | {"grid": np.arange(50.0)}
+    bootstrap = Bootstrap(
+        loss, parameters, xdata, result, mode="nonparametric", resample_xdata=["x"]
+    )
+    replicate = bootstrap.replicate(np.random.default_rng(0))
+    assert np.array_equal(replicate.xdata["grid"], xdata["grid"])
+    idx = np.searchsorted(xdata["x"], replicate.xdata["x"])
+    assert not np.array_equal(idx, np.arange(50))
+    assert np.array_equal(replicate.loss.y_data["y"], loss.y_data["y"][idx])
+
+    xdata["grid"] = np.arange(20.0)
+    bootstrap = Bootstrap(loss, parameters, xdata, result, mode="nonparametric")
+    with pytest.raises(ValueError):
+        bootstrap.replicate(np.random.default_rng(0))
+
+
+def test_bootstrap_nll():
+    s = Symbols("x p mu")
+    model = Model({s.p: sp.exp(-((s.x - s.mu) ** 2) / 2) / sp.sqrt(2 * sp.pi)})  # type: ignore
+    xdata = {"x": np.random.default_rng(0).normal(1.0, 1.0, size=200)}
+    parameters = model.define_parameters("mu")
+    loss = NLLLoss(model)
+    result = Minimize(loss, parameters, xdata).fit()
+
+    with pytest.raises(ValueError):
+        Bootstrap(loss, parameters, xdata, result)
+
+    results = Bootstrap(
+        loss, parameters, xdata, result, mode="nonparametric", n_boot=20, executor="serial", seed=0
+    ).fit()
+    mu = stack_parameters(results)["mu"]
+    # standard error of the mean
+    assert np.std(mu) == pytest.approx(1 / np.sqrt(200), rel=0.5)
@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+import sympy as sp
+from scipy.optimize import approx_fprime
+
+from smitfit.jacobian import Jacobian, jacobian_sparsity
+from smitfit.loss import Loss, MSELoss, NLLLoss, SELoss
+from smitfit.minimize import Minimize
+from smitfit.model import Model
+from smitfit.parameter import Parameters, pack, unpack
+from smitfit.symbol import Symbols
+
+
+def numerical_grad(loss, shapes, x0, **kwargs):
+    def f(p):
+        return loss(**unpack(p, shapes), **kwargs)
+
+    return approx_fprime(x0, f, epsilon=1e-7)
+
+
+def test_loss_gradients():
+    s = Symbols("x y z a b c")
+    model = Model({s.y: s.a * sp.exp(-s.b * s.x) + s.c, s.z: s.y**2 + s.a})  # type: ignore
+    x = np.linspace(0, 2, num=20)
+    rng = np.random.default_rng(0)
+    y_data = {"y": rng.normal(size=20), "z": rng.normal(size=20)}
+
+    params = {"a": np.array(1.2), "b": np.array([0.5, 0.7]).reshape(2, 1), "c": np.array(0.3)}
+    shapes = {k: v.shape for k, v in params.items()}
+    jacobian = Jacobian(model, [s.a, s.b, s.c])
+    assert s.c in jacobian.expr[s.z]
+
+    for loss in [SELoss(model, y_data, weights={"y": 2.0}), MSELoss(model, y_data)]:
+        gradient = loss.gradient(jacobian, **params, x=x)
+        num = numerical_grad(loss, shapes, pack(params.values()), x=x)
+        assert np.allclose(pack(gradient[k] for k in shapes), num, rtol=1e-4)
+
+    nll_model = Model({s.y: s.a * sp.exp(-s.b * s.x) + s.c})  # type: ignore
+    loss = NLLLoss(nll_model)
+    gradient = loss.gradient(Jacobian(nll_model, [s.a, s.b, s.c]), **params, x=x)
+    num = numerical_grad(loss, shapes, pack(params.values()), x=x)
+    assert np.allclose(pack(gradient[k] for k in shapes), num, rtol=1e-4)
+
+
+class AbsLoss(Loss):
+    """Sum of absolute errors, without analytical gradient"""
+
+    def __init__(self, model: Model, y_data: dict):
+        self.model = model
+        self.y_data = y_data
+
+    def __call__(self, **kwargs) -> float:
+        y_model = self.model(**kwargs)
+        return float(sum(np.sum(np.abs(y_model[k] - v)) for k, v in self.y_data.items()))
+
+
+def test_finite_difference_gradient():
+    s = Symbols("x y a b")
+    model = Model({s.y: s.a * sp.exp(-s.b * s.x)})  # type: ignore
+    x = np.linspace(0, 2, num=20)
+    y_data = {"y": np.random.default_rng(0).normal(size=20)}
+    params = {"a": np.array(1.2), "b": np.array([0.5, 0.7]).reshape(2, 1)}
+    shapes = {k: v.shape for k, v in params.items()}
+
+    loss = AbsLoss(model, y_data)
+    gradient = loss.gradient(Jacobian(model, [s.a, s.b]), **params, x=x)
+    num = numerical_grad(loss, shapes, pack(params.values()), x=x)
+    assert np.allclose(pack(gradient[k] for k in shapes), num, rtol=1e-4)
+
+    # Minimize only uses symbolic gradients of SELoss and NLLLoss
+    fitter = Minimize(loss, model.define_parameters("a b"), {"x": x})
+    with pytest.raises(ValueError):
+        fitter.grad(np.ones(2))
+
+
+def test_matrix_gradient():
+    a, b, t = sp.symbols("a b t")
+    model = Model({sp.Symbol("y"): sp.Matrix([[a * t, b], [0, a * b]])})
+    t_arr = np.linspace(0, 1, num=5)
+    y_data = {"y": np.random.default_rng(1).normal(size=(5, 2, 2))}
+    loss = SELoss(model, y_data)
+
+    params = {"a": np.array(0.5), "b": np.array(2.0)}
+    shapes = {k: v.shape for k, v in params.items()}
+    gradient = loss.gradient(Jacobian(model, [a, b]), **params, t=t_arr)
+    num = numerical_grad(loss, shapes, pack(params.values()), t=t_arr)
+    assert np.allclose(pack(gradient[k] for k in shapes), num, rtol=1e-4)
+
+
+def test_minimize_jacobian():
+    s = Symbols("x y a b")
+    model = Model({s.y: s.a * s.x + s.b})  # type: ignore
+    x = np.linspace(0, 11, num=100)
+    y = 0.15 * x + 2.5 + np.random.default_rng(43).normal(0, 0.1, size=100)
+
+    parameters = Parameters.from_names(["a", "b"])
+    objective = Minimize(SELoss(model, {"y": y}), parameters, {"x": x})
+    assert objective.jacobian is not None
+    result = objective.fit()
+
+    assert result.base_result.njev == result.base_result.nfev
+    assert np.allclose(pack(result.fit_parameters.values()), np.polyfit(x, y, deg=1), rtol=1e-4)
+
+
+def test_jacobian_sparsity():
+    x = np.linspace(0, 1, 4)
+    model = Model(
+        {
+            sp.Symbol("y1"): sp.Symbol("a") * sp.Symbol("x") + sp.Symbol("c"),
+            sp.Symbol("u"): sp.Symbol("b") * sp.Symbol("x"),
+            sp.Symbol("y2"): sp.Symbol("u") ** 2 + sp.Symbol("d"),
+        }
+    )
+    parameters = {"a": (), "b": (), "c": (), "d": (4,)}
+    pattern = jacobian_sparsity(model, {"y1": (4,), "y2": (4,)}, parameters)
+    assert pattern.shape == (8, 7)
+
+    # compare with the nonzeros of a numerical jacobian
+    values = {"a": 1.5, "b": 0.5, "c": 2.0, "d": np.arange(4.0)}
+    x0 = pack(values.values())
+
+    def f(p):
+        ans = model(**unpack(p, parameters), x=x + 1)
+        return np.concatenate([ans["y1"], ans["y2"]])
+
+    numerical = np.stack([(f(x0 + 1e-6 * e) - f(x0)) / 1e-6 for e in np.eye(len(x0))], axis=1)
+    assert np.array_equal(pattern.toarray(), numerical != 0)
+
+    loss = SELoss(model, {"y1": x, "y2": x})
+    assert np.array_equal(loss.jac_sparsity(parameters).toarray(), pattern.toarray())
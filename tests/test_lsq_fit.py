@@ -1,8 +1,16 @@
 import numpy as np
-from smitfit.loss import MSELoss
+import pytest
+import sympy as sp
+from scipy.optimize import approx_fprime
+
+from smitfit.least_squares import LeastSquares
+from smitfit.linear import LinearLeastSquares, linear_parameters
+from smitfit.loss import MSELoss, SELoss
 from smitfit.minimize import Minimize
 from smitfit.model import Model
+from smitfit.parameter import pack
 from smitfit.symbol import Symbols
+from smitfit.varpro import VarPro
 
 
 def test_fit():
@@ -27,3 +35,170 @@ def test_fit():
     expected = {"a": np.array(0.14567421), "b": np.array(2.5566292)}
     for k, v in result.parameters.items():
         assert np.allclose(v, expected[k])
+
+
+def test_least_squares():
+    s = Symbols("x y a b")
+    model = Model({s.y: s.a * s.x + s.b})  # type: ignore
+
+    np.random.seed(43)
+    gt = {"a": 0.15, "b": 2.5}
+
+    xdata = np.linspace(0, 11, num=100)
+    ydata = gt["a"] * xdata + gt["b"]
+
+    noise = np.random.normal(0, scale=ydata / 10.0 + 0.2)
+    ydata += noise
+    parameters = model.define_parameters("a b")
+
+    expected = {"a": np.array(0.14567421), "b": np.array(2.5566292)}
+    for loss in [SELoss(model, dict(y=ydata)), MSELoss(model, dict(y=ydata))]:
+        objective = LeastSquares(loss, parameters, dict(x=xdata))
+        assert objective.jacobian is not None
+        result = objective.fit()
+        for k, v in result.parameters.items():
+            assert np.allclose(v, expected[k])
+
+    # errors match the closed form ordinary least squares covariance
+    A = np.stack([xdata, np.ones_like(xdata)], axis=1)
+    residuals = ydata - A @ np.array([expected["a"], expected["b"]])
+    cov = np.sum(residuals**2) / (len(xdata) - 2) * np.linalg.inv(A.T @ A)
+    assert np.allclose([result.errors["a"], result.errors["b"]], np.sqrt(np.diag(cov)), rtol=1e-4)
+
+
+def test_least_squares_array_parameters():
+    s = Symbols("x y z a b")
+    model = Model({s.y: s.a * s.x + s.b, s.z: s.a * s.x**2})  # type: ignore
+
+    xdata = np.linspace(0, 1, num=20)
+    a = np.array([[1.0], [2.0], [3.0]])
+    ydata = {"y": a * xdata + 0.5, "z": a * xdata**2}
+
+    parameters = model.define_parameters("a b")
+    parameters["a"].set_guess(np.ones((3, 1)))
+
+    objective = LeastSquares(SELoss(model, ydata), parameters, dict(x=xdata))
+    x0 = pack(parameters.free.guess.values())
+    numerical = approx_fprime(x0, objective.residuals, epsilon=1e-7)
+    assert np.allclose(objective.jac(x0), numerical, atol=1e-5)
+
+    result = objective.fit()
+    assert np.allclose(result.parameters["a"], a)
+    assert np.allclose(result.parameters["b"], 0.5)
+
+
+def test_fit_element_fixed_mask():
+    s = Symbols("x y a b")
+    model = Model({s.y: s.a * s.x + s.b})  # type: ignore
+
+    xdata = np.linspace(0, 1, num=20)
+    a = np.array([[1.0], [2.0], [3.0]])
+    ydata = {"y": a * xdata + 0.5}
+
+    parameters = model.define_parameters("a b")
+    parameters["a"].set_guess(np.array([[1.5], [1.5], [3.0]])).fix([[False], [False], [True]])
+
+    for fitter in [Minimize, LeastSquares]:
+        objective = fitter(SELoss(model, ydata), parameters, dict(x=xdata))
+        assert len(objective.plan) == 3
+        result = objective.fit()
+        # the fixed element is held at its guess
+        assert result.parameters["a"][2, 0] == 3.0
+        assert np.allclose(result.parameters["a"], a, atol=1e-4)
+        assert result.errors["a"][2, 0] == 0.0
+
+
+def test_linear_least_squares():
+    s = Symbols("x y a b c")
+    model = Model({s.y: s.a * s.x**2 + s.b * s.x + s.c})  # type: ignore
+
+    rng = np.random.default_rng(43)
+    xdata = np.linspace(0, 5, num=50)
+    sigma = 0.1 + 0.05 * xdata
+    ydata = 0.5 * xdata**2 - 1.2 * xdata + 3.0 + rng.normal(0, sigma)
+
+    parameters = model.define_parameters("a b c")
+    loss = SELoss(model, dict(y=ydata), weights=dict(y=1 / sigma))
+    objective = LinearLeastSquares(loss, parameters, dict(x=xdata))
+    assert objective.is_linear
+    result = objective.fit()
+
+    # weighted least squares closed form
+    A = np.stack([xdata**2, xdata, np.ones_like(xdata)], axis=1) / sigma[:, None]
+    coef, *_ = np.linalg.lstsq(A, ydata / sigma, rcond=None)
+    assert np.allclose(pack(result.parameters.values()), coef)
+
+    chi_squared = np.sum((A @ coef - ydata / sigma) ** 2) / (len(xdata) - 3)
+    cov = chi_squared * np.linalg.inv(A.T @ A)
+    assert np.allclose(pack(result.errors.values()), np.sqrt(np.diag(cov)))
+
+    # matches the iterative solution
+    iterative = LeastSquares(loss, parameters, dict(x=xdata)).fit()
+    for k, v in iterative.parameters.items():
+        assert np.allclose(v, result.parameters[k], rtol=1e-5)
+
+    # bounded solutions are constrained
+    parameters["a"].upper_bound = 0.4
+    result = LinearLeastSquares(loss, parameters, dict(x=xdata)).fit()
+    assert np.isclose(result.parameters["a"], 0.4)
+
+    nonlinear = Model({s.y: s.a * sp.exp(-s.b * s.x)})  # type: ignore
+    objective = LinearLeastSquares(
+        SELoss(nonlinear, dict(y=ydata)), nonlinear.define_parameters("a b"), dict(x=xdata)
+    )
+    assert not objective.is_linear
+
+
+def test_varpro():
+    s = Symbols("x y a1 a2 k1 k2 c")
+    model = Model(
+        {s.y: s.a1 * sp.exp(-s.k1 * s.x) + s.a2 * sp.exp(-s.k2 * s.x) + s.c}  # type: ignore
+    )
+
+    rng = np.random.default_rng(0)
+    xdata = np.linspace(0, 10, num=200)
+    ydata = 3 * np.exp(-2 * xdata) + 1.5 * np.exp(-0.3 * xdata) + 0.2
+    ydata += rng.normal(0, 0.02, size=xdata.size)
+
+    parameters = model.define_parameters("a1 a2 k1 k2 c")
+    parameters["k1"].set_guess(5.0)
+    parameters["k2"].set_guess(0.05)
+    parameters["k1"].lower_bound = 0.0
+
+    loss = SELoss(model, dict(y=ydata))
+    objective = VarPro(loss, parameters, dict(x=xdata))
+    result = objective.fit()
+    assert objective.linear == ["a1", "a2", "c"]
+    assert len(result.base_result.x) == 2
+
+    expected = LeastSquares(loss, parameters, dict(x=xdata)).fit()
+    for k, v in expected.parameters.items():
+        assert np.allclose(result.parameters[k], v, rtol=1e-5)
+        assert np.allclose(result.errors[k], expected.errors[k], rtol=1e-4)
+
+    # products of parameters are linear in only one of them
+    s = Symbols("x y a b")
+    model = Model({s.y: s.a * s.b * s.x})  # type: ignore
+    jacobian = model.jacobian({s.a, s.b})
+    assert linear_parameters(jacobian, {s.a, s.b}) == [s.b]
+
+    parameters = model.define_parameters("a b")
+    with pytest.raises(ValueError):
+        VarPro(SELoss(model, dict(y=xdata)), parameters, dict(x=xdata), linear=["a", "b"]).fit()
+
+
+def test_curve_fit_f():
+    from smitfit.curve_fit import CurveFit
+    from smitfit.function import Function
+
+    f = Function("a*x + b")
+    xdata = {"x": np.linspace(0, 1, num=20)}
+    ydata = {"y": 2.0 * xdata["x"] + 1.0}
+    objective = CurveFit(f, f.define_parameters("a b"), xdata, ydata)
+    result = objective.fit()
+    popt = pack(result.parameters.values())
+    assert np.allclose(popt, [2.0, 1.0])
+
+    # after fitting, `f` evaluates at the given x values
+    new_x = np.linspace(2, 3, num=5)
+    assert np.allclose(objective.f(new_x, *popt), 2.0 * new_x + 1.0)
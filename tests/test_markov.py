@@ -0,0 +1,255 @@
+import numpy as np
+import pytest
+import sympy as sp
+from scipy import sparse
+
+from smitfit.composite_expr import MarkovIVP
+from smitfit.expr import SparseMatrixExpr
+from smitfit.markov import (
+    TransitionTemplate,
+    extract_states,
+    generate_transition_matrix,
+    parse_transitions,
+)
+from smitfit.model import Model
+from smitfit.symbol import symbol_matrix
+
+
+def markov_model(connectivity: list[str], sparse: bool = False, **kwargs) -> Model:
+    m = generate_transition_matrix(connectivity, sparse=sparse)
+    states = extract_states(connectivity)
+    y0 = symbol_matrix(name="y0", shape=(len(states), 1), suffix=states)
+    return Model({sp.Symbol("y"): MarkovIVP(sp.Symbol("t"), m, y0, **kwargs)})
+
+
+values = {
+    "k_A_B": 1e0,
+    "k_B_A": 5e-2,
+    "k_B_C": 5e-1,
+    "y0_A": 1.0,
+    "y0_B": 0.0,
+    "y0_C": 0.0,
+}
+
+
+@pytest.mark.parametrize("solver", ["eig", "expm"])
+def test_markov_matrix_exponential(solver):
+    connectivity = ["A <-> B -> C"]
+    reference = markov_model(connectivity, rtol=1e-10, atol=1e-12)
+    model = markov_model(connectivity, solver=solver)
+
+    for t in [np.linspace(0, 11, num=50), np.geomspace(1e-3, 11, num=50)]:
+        expected = reference(**values, t=t)["y"]
+        y = model(**values, t=t)["y"]
+        assert y.shape == (3, 50)
+        assert np.allclose(y, expected, atol=1e-8)
+
+
+def test_markov_eig_fallback():
+    # A -> B -> C with equal rates has a defective transition matrix
+    connectivity = ["A -> B -> C"]
+    kwargs = {"k_A_B": 1.0, "k_B_C": 1.0, "y0_A": 1.0, "y0_B": 0.0, "y0_C": 0.0}
+    t = np.linspace(0, 5, num=20)
+
+    expected = markov_model(connectivity, rtol=1e-10, atol=1e-12)(**kwargs, t=t)["y"]
+    y = markov_model(connectivity, solver="eig", rtol=1e-10, atol=1e-12)(**kwargs, t=t)["y"]
+    assert np.allclose(y, expected, atol=1e-8)
+
+    with pytest.raises(ValueError):
+        markov_model(connectivity, solver="pade")
+
+
+def test_markov_ivp_jacobian(monkeypatch):
+    connectivity = ["A <-> B -> C"]
+    t = np.linspace(0, 11, num=50)
+    expected = markov_model(connectivity, solver="eig")(**values, t=t)["y"]
+
+    calls = []
+    grad_func = MarkovIVP.grad_func
+
+    def counting_grad_func(t, y, trs_matrix):
+        calls.append(y.shape)
+        return grad_func(t, y, trs_matrix)
+
+    monkeypatch.setattr(MarkovIVP, "grad_func", staticmethod(counting_grad_func))
+
+    columns = {}
+    for name, kwargs in [
+        ("exact", {}),
+        ("sparsity", {"jac_sparsity": True}),
+        ("finite differences", {"jac": None}),
+    ]:
+        calls.clear()
+        y = markov_model(connectivity, rtol=1e-8, atol=1e-10, **kwargs)(**values, t=t)["y"]
+        assert np.allclose(y, expected, atol=1e-6)
+        columns[name] = {shape[-1] if len(shape) == 2 else 1 for shape in calls}
+
+    # finite differences of the jacobian evaluate the right-hand side for multiple columns
+    assert columns["exact"] == {1}
+    assert columns["finite differences"] == {1, 3}
+
+    m = markov_model(connectivity, jac_sparsity=True).expr[sp.Symbol("y")]
+    assert m.sparsity().sum() == 5
+
+
+@pytest.mark.parametrize("solver", ["ivp", "eig", "expm"])
+def test_markov_sparse(solver):
+    connectivity = ["A <-> B -> C", "C <-> D"]
+    kwargs = {"k_A_B": 1.0, "k_B_A": 0.05, "k_B_C": 0.5, "k_C_D": 0.2, "k_D_C": 0.1}
+    kwargs |= {"y0_A": 1.0, "y0_B": 0.0, "y0_C": 0.0, "y0_D": 0.0}
+    t = np.linspace(0, 11, num=50)
+
+    m = generate_transition_matrix(connectivity, sparse=True)
+    assert isinstance(m, sp.SparseMatrix)
+    assert m == generate_transition_matrix(connectivity)
+
+    trs_matrix = SparseMatrixExpr(m)(**kwargs)
+    assert sparse.issparse(trs_matrix)
+    assert trs_matrix.nnz == 9
+
+    expected = markov_model(connectivity, solver="eig")(**kwargs, t=t)["y"]
+    model = markov_model(connectivity, sparse=True, solver=solver, rtol=1e-10, atol=1e-12)
+    assert isinstance(model.expr[sp.Symbol("y")].expr["trs_matrix"], SparseMatrixExpr)
+    assert np.allclose(model(**kwargs, t=t)["y"], expected, atol=1e-8)
+
+
+def test_parse_transitions():
+    connectivity = ["A <-> B -> C", "C -> A"]
+    transitions = parse_transitions(connectivity)
+    assert list(transitions.states) == extract_states(connectivity) == ["A", "B", "C"]
+    assert transitions.rate_names() == ["k_A_B", "k_B_A", "k_B_C", "k_C_A"]
+
+    # repeated states within a reaction equation
+    m = generate_transition_matrix(["A -> B -> A"])
+    k_A_B, k_B_A = sp.symbols("k_A_B k_B_A")
+    assert m == sp.Matrix([[-k_A_B, k_B_A], [k_A_B, -k_B_A]])
+
+    with pytest.raises(ValueError):
+        parse_transitions(["A => B"])
+    with pytest.raises(ValueError):
+        parse_transitions(["A_1 -> B"])
+
+
+def test_transition_template():
+    connectivity = ["A <-> B -> C", "C <-> D", "B -> C"]
+    kwargs = {"k_A_B": 1.0, "k_B_A": 0.05, "k_B_C": 0.5, "k_C_D": 0.2, "k_D_C": 0.1}
+    template = TransitionTemplate(connectivity)
+    assert template.states == extract_states(connectivity)
+    assert {s.name for s in template.symbols} == set(kwargs)
+
+    trs_matrix = template(**kwargs)
+    assert sparse.issparse(trs_matrix)
+    expected = SparseMatrixExpr(generate_transition_matrix(connectivity))(**kwargs)
+    assert np.allclose(trs_matrix.toarray(), expected.toarray())
+
+    y0 = symbol_matrix(name="y0", shape=(4, 1), suffix=template.states)
+    kwargs |= {"y0_A": 1.0, "y0_B": 0.0, "y0_C": 0.0, "y0_D": 0.0}
+    t = np.linspace(0, 11, num=50)
+    reference = markov_model(connectivity, solver="eig")(**kwargs, t=t)["y"]
+    for solver in ["ivp", "expm"]:
+        markov = MarkovIVP(sp.Symbol("t"), template, y0, solver=solver, rtol=1e-10, atol=1e-12)
+        model = Model({sp.Symbol("y"): markov})
+        assert np.allclose(model(**kwargs, t=t)["y"], reference, atol=1e-8)
+
+    # finite difference jacobian with the nonzero structure of the template
+    markov = MarkovIVP(sp.Symbol("t"), template, y0, jac_sparsity=True, rtol=1e-10, atol=1e-12)
+    expected = SparseMatrixExpr(generate_transition_matrix(connectivity))(**kwargs) != 0
+    assert np.array_equal(markov.sparsity().toarray(), expected.toarray())
+    model = Model({sp.Symbol("y"): markov})
+    assert np.allclose(model(**kwargs, t=t)["y"], reference, atol=1e-8)
+
+
+@pytest.mark.parametrize("solver", ["ivp", "eig", "expm"])
+def test_markov_batched(solver):
+    connectivity = ["A <-> B -> C"]
+    t = np.linspace(0, 11, num=50)
+    batch = {
+        "k_A_B": np.array([1.0, 0.5, 2.0]),
+        "k_B_A": np.array([0.05, 0.1, 0.2]),
+        "y0_A": np.array([1.0, 0.5, 0.0]),
+        "y0_B": np.array([0.0, 0.5, 1.0]),
+    }
+    shared = {"k_B_C": 0.5, "y0_C": 0.0}
+
+    reference = markov_model(connectivity, solver="eig")
+    expected = np.stack(
+        [reference(**{k: v[i] for k, v in batch.items()}, **shared, t=t)["y"] for i in range(3)]
+    )
+
+    model = markov_model(connectivity, solver=solver, rtol=1e-10, atol=1e-12)
+    y = model(**batch, **shared, t=t)["y"]
+    assert y.shape == (3, 3, 50)
+    assert np.allclose(y, expected, atol=1e-8)
+
+    # batched initial populations only, with a sparse transition rate matrix
+    y0_batch = {k: v for k, v in batch.items() if k.startswith("y0")}
+    rates = {k: v[0] for k, v in batch.items() if k.startswith("k")}
+    model = markov_model(connectivity, sparse=True, solver=solver, rtol=1e-10, atol=1e-12)
+    y = model(**y0_batch, **rates, **shared, t=t)["y"]
+    expected = np.stack(
+        [
+            reference(**{k: v[i] for k, v in y0_batch.items()}, **rates, **shared, t=t)["y"]
+            for i in range(3)
+        ]
+    )
+    assert y.shape == (3, 3, 50)
+    assert np.allclose(y, expected, atol=1e-8)
+
+    # batched through `Model.call_batched`, which inserts singleton axes
+    model = markov_model(connectivity, solver=solver, rtol=1e-10, atol=1e-12)
+    y = model.call_batched(batch, **shared, t=t)["y"]
+    assert y.shape == (3, 3, 50)
+    assert np.allclose(
+        y,
+        np.stack(
+            [reference(**{k: v[i] for k, v in batch.items()}, **shared, t=t)["y"] for i in range(3)]
+        ),
+        atol=1e-8,
+    )
+    y = model.call_batched({k: v[:1] for k, v in batch.items()}, **shared, t=t)["y"]
+    assert y.shape == (1, 3, 50)
+
+
+def test_markov_batched_jac():
+    connectivity = ["A <-> B -> C"]
+    t = np.linspace(0, 11, num=50)
+    y0 = {"y0_A": np.array([1.0, 0.5]), "y0_B": np.array([0.0, 0.5]), "y0_C": 0.0}
+    rates = {"k_A_B": 1.0, "k_B_A": 0.05, "k_B_C": 0.5}
+    jac = SparseMatrixExpr(generate_transition_matrix(connectivity))(**rates).toarray()
+
+    expected = markov_model(connectivity, solver="eig")(**y0, **rates, t=t)["y"]
+    for method in ["Radau", "LSODA"]:
+        model = markov_model(connectivity, method=method, jac=jac, rtol=1e-10, atol=1e-12)
+        assert np.allclose(model(**y0, **rates, t=t)["y"], expected, atol=1e-8)
+
+    model = markov_model(connectivity, jac=lambda t, y, m: m)
+    with pytest.raises(ValueError):
+        model(**y0, **rates, t=t)
+
+
+def test_transition_template_subs():
+    connectivity = ["A <-> B -> C"]
+    template = TransitionTemplate(connectivity)
+    kwargs = {"k_A_B": 1.0, "k_B_A": 0.05, "k_B_C": 0.5}
+    expected = template(**kwargs).toarray()
+
+    substituted = template.subs(k_B_A=0.05)
+    assert {s.name for s in substituted.symbols} == {"k_A_B", "k_B_C"}
+    assert np.allclose(substituted(k_A_B=1.0, k_B_C=0.5).toarray(), expected)
+
+    # renamed rates which coincide add up
+    renamed = template.subs(k_B_C=sp.Symbol("k_A_B"))
+    assert {s.name for s in renamed.symbols} == {"k_A_B", "k_B_A"}
+    assert np.allclose(
+        renamed(k_A_B=1.0, k_B_A=0.05).toarray(), template(**(kwargs | {"k_B_C": 1.0})).toarray()
+    )
+
+    with pytest.raises(TypeError):
+        template.subs(k_A_B=2 * sp.Symbol("k_B_A"))
+
+    y0 = symbol_matrix(name="y0", shape=(3, 1), suffix=template.states)
+    t, y = sp.Symbol("t"), sp.Symbol("y")
+    model = Model({y: MarkovIVP(t, template, y0)}).subs(k_B_A=0.05)
+    values = {"k_A_B": 1.0, "k_B_C": 0.5, "y0_A": 1.0, "y0_B": 0.0, "y0_C": 0.0}
+    ans = model(**values, t=np.linspace(0, 11, num=20))["y"]
+    assert ans.shape == (3, 20)
@@ -0,0 +1,53 @@
+import numpy as np
+
+from smitfit.loss import SELoss
+from smitfit.memoize import EvaluationCache
+from smitfit.minimize import Minimize
+from smitfit.model import Model
+from smitfit.symbol import Symbols
+
+
+def test_evaluation_cache():
+    calls = []
+
+    def func(x):
+        calls.append(x)
+        return x.sum()
+
+    cache = EvaluationCache(func, maxsize=2)
+    x = np.array([1.0, 2.0])
+    assert cache(x) == 3.0
+    assert cache(x.copy()) == 3.0
+    assert len(calls) == 1
+
+    # modifying the array passed in does not affect the cache
+    x[0] = 5.0
+    assert cache(x) == 7.0
+    assert cache(np.array([1.0, 2.0])) == 3.0
+    assert cache(np.array([0.0, 0.0])) == 0.0
+    assert cache.cache_info() == (2, 3, 2, 2)
+
+    # [5, 2] was least recently used and evicted
+    assert cache(x) == 7.0
+    assert cache.misses == 4
+
+    cache.clear()
+    assert cache.cache_info() == (0, 0, 2, 0)
+
+
+def test_minimize_cache():
+    s = Symbols("x y a b")
+    model = Model({s.y: s.a * s.x + s.b})  # type: ignore
+    xdata = np.linspace(0, 11, num=100)
+    ydata = 0.15 * xdata + 2.5
+
+    objective = Minimize(
+        SELoss(model, dict(y=ydata)), model.define_parameters("a b"), dict(x=xdata)
+    )
+    result = objective.fit()
+    assert np.allclose(result.parameters["a"], 0.15)
+
+    # gradient and final evaluations at the optimum reuse the objective's model evaluation
+    info = objective.model_cache.cache_info()
+    assert info.hits >= result.base_result.njev
+    assert info.misses == result.base_result.nfev
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import sympy as sp
+
+from smitfit.least_squares import LeastSquares
+from smitfit.loss import SELoss
+from smitfit.model import Model
+from smitfit.multistart import MultiStart, sample_starts
+from smitfit.parameter import Parameter, Parameters
+from smitfit.symbol import Symbols
+
+
+def test_sample_starts():
+    parameters = Parameters(
+        [
+            Parameter("a", guess=2.0, lower_bound=1.0, upper_bound=5.0),
+            Parameter("b", guess=np.array([3.0, 0.0]), lower_bound=0.0),
+            Parameter("c", guess=1.0).fix(),
+        ]
+    )
+    for sampling in ["random", "latin"]:
+        starts = sample_starts(parameters, 50, sampling, rng=np.random.default_rng(0))
+        assert starts.shape == (50, 3)
+        assert np.all((starts[:, 0] >= 1.0) & (starts[:, 0] <= 5.0))
+        assert np.all((starts[:, 1] >= 0.0) & (starts[:, 1] <= 6.0))
+        assert np.all((starts[:, 2] >= -1.0) & (starts[:, 2] <= 1.0))
+
+    with pytest.raises(ValueError):
+        sample_starts(parameters, 5, "grid")  # type: ignore
+
+
+def test_multistart():
+    s = Symbols("x y w")
+    model = Model({s.y: sp.sin(s.w * s.x)})  # type: ignore
+    xdata = {"x": np.linspace(0, 10, 100)}
+    ydata = {"y": np.sin(2.3 * xdata["x"])}
+    parameters = model.define_parameters("w")
+    parameters["w"].set_bounds(0.1, 5.0)
+
+    kwargs = dict(n_starts=6, sampling="latin", fitter=LeastSquares, seed=1)
+    results = MultiStart(SELoss(model, ydata), parameters, xdata, max_workers=1, **kwargs).fit()
+    losses = [r.gof_qualifiers["loss"] for r in results]
+    assert losses == sorted(losses)
+    assert np.isclose(results[0].parameters["w"], 2.3)
+    assert parameters["w"].guess == 1.0  # guesses of the original parameters are not modified
+
+    parallel = MultiStart(SELoss(model, ydata), parameters, xdata, max_workers=2, **kwargs).fit()
+    for r1, r2 in zip(results, parallel):
+        assert np.allclose(r1.parameters["w"], r2.parameters["w"])
+
+
+class FailingLeastSquares(LeastSquares):
+    """Fails for starting points with a guess of `w` below 2"""
+
+    def fit(self):
+        if self.parameters["w"].guess < 2.0:
+            raise ValueError("bad start")
+        return super().fit()
+
+
+def test_multistart_failures():
+    s = Symbols("x y w")
+    model = Model({s.y: sp.sin(s.w * s.x)})  # type: ignore
+    xdata = {"x": np.linspace(0, 10, 100)}
+    ydata = {"y": np.sin(2.3 * xdata["x"])}
+    parameters = model.define_parameters("w")
+    parameters["w"].set_bounds(0.1, 5.0)
+
+    kwargs = dict(n_starts=6, sampling="latin", max_workers=1, seed=1)
+    results = MultiStart(
+        SELoss(model, ydata), parameters, xdata, fitter=FailingLeastSquares, **kwargs
+    ).fit()
+    failed = [r for r in results if "error" in r.metadata]
+    assert 0 < len(failed) < len(results)
+    assert results[-1] is failed[-1]
+    assert np.isinf(failed[0].gof_qualifiers["loss"])
+    assert np.isnan(failed[0].parameters["w"])
+    assert failed[0].metadata["error"] == "ValueError: bad start"
+
+    parameters["w"].set_bounds(0.1, 1.0)
+    with pytest.raises(RuntimeError, match="bad start"):
+        MultiStart(
+            SELoss(model, ydata), parameters, xdata, fitter=FailingLeastSquares, **kwargs
+        ).fit()
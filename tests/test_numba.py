@@ -0,0 +1,61 @@
+import sys
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from smitfit.codegen import lambdify
+from smitfit.expr import SympyExpr, SympyMatrixExpr
+from smitfit.model import Model
+from smitfit.symbol import Symbols
+
+
+def test_numba_fallback(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numba", None)
+    a, x = sp.symbols("a x")
+    with pytest.warns(UserWarning, match="falling back"):
+        f = lambdify([a, x], a * x, backend="numba")
+    assert f(2.0, 3.0) == 6.0
+
+    with pytest.raises(ValueError):
+        lambdify([a, x], a * x, backend="fortran")  # type: ignore
+
+
+def test_numba_expressions():
+    pytest.importorskip("numba")
+    s = Symbols("x y z a b")
+    x = np.linspace(0, 1, num=50)
+
+    expr = s.a * sp.exp(-s.b * s.x**2)  # type: ignore
+    numba_expr = SympyExpr(expr, backend="numba")
+    assert np.allclose(numba_expr(a=2.0, b=3.0, x=x), SympyExpr(expr)(a=2.0, b=3.0, x=x))
+    assert numba_expr.subs(a=1.0).backend == "numba"
+
+    b = np.array([1.0, 2.0]).reshape(2, 1)
+    result = numba_expr(a=2.0, b=b, x=x)
+    assert result.shape == (2, 50)
+    assert np.allclose(result, SympyExpr(expr)(a=2.0, b=b, x=x))
+
+    matrix = sp.Matrix([[s.a * s.x, 0], [1, s.b]])  # type: ignore
+    numba_matrix = SympyMatrixExpr(matrix, backend="numba")
+    result = numba_matrix(a=2.0, b=3.0, x=x)
+    assert result.shape == (50, 2, 2)
+    assert np.allclose(result, SympyMatrixExpr(matrix)(a=2.0, b=3.0, x=x))
+
+    model_dict = {s.y: expr, s.z: s.y + s.a * s.b}  # type: ignore
+    kwargs = {"a": 2.0, "b": 3.0, "x": x}
+    expected = Model(model_dict)(**kwargs)
+    for compiled in [False, True]:
+        result = Model(model_dict, compiled=compiled, backend="numba")(**kwargs)
+        for k in expected:
+            assert np.allclose(result[k], expected[k])
+
+
+def test_numba_unsupported():
+    pytest.importorskip("numba")
+    x, a = sp.symbols("x a")
+    values = np.linspace(0, 1, num=5)
+    for expr in [sp.Max(x, a), sp.erf(a * x), sp.Piecewise((x, x > a), (a, True))]:
+        with pytest.warns(UserWarning, match="falling back"):
+            f = lambdify([x, a], expr, backend="numba")
+        assert np.allclose(f(values, 0.5), lambdify([x, a], expr)(values, 0.5))
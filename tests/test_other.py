@@ -1,6 +1,7 @@
+import pytest
 from smitfit.model import Model
 import sympy as sp
-from smitfit.expr import Expr
+from smitfit.expr import CustomFunction, Expr
 import numpy as np
 from smitfit.function import Function
 
@@ -34,3 +35,165 @@ def test_func_expr():
     func = Function(Expr(arr))
 
     assert np.allclose(func(), arr)
+
+
+def test_model_bind():
+    a, b, x, y, z = sp.symbols("a b x y z")
+    model_dict = {y: a * x + b, z: y * a}
+    x_arr = np.linspace(0, 1, num=5)
+    for compiled in [False, True]:
+        model = Model(model_dict, compiled=compiled)
+        bound = model.bind(["a", "b"], x=x_arr, unused=1.0)
+        result = bound(2.0, 3.0)
+        expected = model(a=2.0, b=3.0, x=x_arr)
+        assert result.keys() == expected.keys()
+        for k in expected:
+            assert np.allclose(result[k], expected[k])
+
+    with pytest.raises(KeyError):
+        Model(model_dict).bind(["a"], x=x_arr)
+
+
+def test_function_bind():
+    func = Function("a*x + b")
+    bound = func.bind(["x", "a"], b=1.0)
+    assert bound(2.0, 3.0) == 7.0
+
+
+def test_model_bind_precompute():
+    a, b, x, y, z, w = sp.symbols("a b x y z w")
+    calls = []
+
+    def basis(**kwargs):
+        calls.append(1)
+        return np.sin(kwargs["x"])
+
+    model_dict = {
+        y: a * sp.exp(-(x**2)) * sp.log(x) + b,
+        z: sp.Matrix([[sp.exp(x), a], [x**2, 0]]),
+        w: CustomFunction(basis, [x]),
+    }
+    x_arr = np.linspace(0.1, 1, num=5)
+    for compiled in [False, True]:
+        if compiled:
+            model_dict.pop(w)
+        model = Model(model_dict, compiled=compiled)
+        precompute, steps = model.partition(frozenset({"x"}))
+        assert len(precompute) > 0
+        assert all("x" not in step.args for step in steps)
+
+        bound = model.bind(["a", "b"], x=x_arr)
+        expected = model(a=2.0, b=3.0, x=x_arr)
+        for _ in range(3):
+            result = bound(2.0, 3.0)
+            for k in expected:
+                assert np.allclose(result[k], expected[k])
+
+    assert len(calls) == 2
+
+
+def test_model_select():
+    model = Model(["u == a * x", "y == u + b", "z == c * x**2"])
+    selected = model.select(["y"])
+    assert {k.name for k in selected.call_stack} == {"u", "y"}
+    assert {s.name for s in selected.x_symbols} == {"a", "b", "x"}
+
+    x = np.linspace(0, 1, 5)
+    ans = selected(a=2.0, b=1.0, x=x)
+    assert set(ans) == {"u", "y"}
+    assert np.allclose(ans["y"], 2.0 * x + 1.0)
+
+    assert model.select(["y", "z"]) is model
+    with pytest.raises(KeyError):
+        model.select(["w"])
+
+    from smitfit.loss import SELoss
+
+    loss = SELoss(model, {"y": 2.0 * x + 1.0})
+    assert loss.model is not model
+    assert loss(a=2.0, b=1.0, x=x) == pytest.approx(0.0)
+
+
+def test_call_batched():
+    model = Model(["u == a * x", "y == u + b", "z == c"])
+    x = np.linspace(0, 1, 5)
+    a = np.array([1.0, 2.0, 3.0])
+    b = np.array([0.0, 0.5, 1.0])
+
+    ans = model.call_batched({"a": a, "b": b}, x=x, c=2.0)
+    assert ans["y"].shape == (3, 5)
+    for i in range(3):
+        assert np.allclose(ans["y"][i], a[i] * x + b[i])
+    assert ans["z"].shape == (3,)
+
+    compiled = Model(["u == a * x", "y == u + b", "z == c"], compiled=True)
+    ans_c = compiled.call_batched({"a": a, "b": b}, x=x, c=2.0)
+    assert np.allclose(ans_c["y"], ans["y"])
+
+    m = sp.Matrix([[sp.Symbol("a"), sp.Symbol("x")], [0, 1]])
+    matrix_model = Model({sp.Symbol("m"): m})
+    ans = matrix_model.call_batched({"a": a}, x=x)
+    assert ans["m"].shape == (3, 5, 2, 2)
+    assert np.allclose(ans["m"][:, 0, 0, 0], a)
+
+    ans = matrix_model.call_batched({"a": a[:1]}, x=1.0)
+    assert ans["m"].shape == (1, 2, 2)
+
+    # batch of size 1 of a matrix output with a single row
+    row = Model({sp.Symbol("m"): sp.Matrix([[sp.Symbol("a"), sp.Symbol("b")]])})
+    ans = row.call_batched({"a": a[:1]}, b=2.0)
+    assert ans["m"].shape == (1, 1, 2)
+    assert np.allclose(ans["m"], [[[1.0, 2.0]]])
+    assert row(a=1.0, b=2.0)["m"].shape == (1, 2)
+    assert row.call_batched({"a": a}, b=2.0)["m"].shape == (3, 1, 2)
+
+    with pytest.raises(ValueError):
+        model.call_batched({"a": a, "b": b[:2]}, x=x, c=2.0)
+
+    # unbatched outputs with a leading dimension equal to the batch size
+    model = Model(["y == a * x", "z == c * x"])
+    for n in [3, 4]:
+        ans = model.call_batched({"a": a}, x=np.linspace(0, 1, n), c=2.0)
+        assert ans["y"].shape == ans["z"].shape == (3, n)
+
+
+def test_se_loss_fused():
+    from smitfit.loss import MSELoss, SELoss
+
+    model = Model(["y == a * x + b", "z == a * x**2"])
+    x = np.linspace(0, 1, 10)
+    y_data = {"y": np.sin(x), "z": np.cos(x)}
+    weights = {"y": 2.0, "z": np.linspace(1, 2, 10)}
+    y_model = model(a=1.5, b=0.5, x=x)
+
+    loss = SELoss(model, y_data, weights)
+    expected = np.concatenate(
+        [2.0 * (y_model["y"] - y_data["y"]), weights["z"] * (y_model["z"] - y_data["z"])]
+    )
+    residuals, value = loss.residuals_and_loss(y_model)
+    assert np.allclose(residuals, expected)
+    assert value == pytest.approx(np.sum(expected**2))
+    assert loss(a=1.5, b=0.5, x=x) == pytest.approx(np.sum(expected**2))
+
+    squares = loss.squares(a=1.5, b=0.5, x=x)
+    assert {k: v.shape for k, v in squares.items()} == loss.residual_shapes
+    assert np.allclose(np.concatenate([squares["y"], squares["z"]]), expected**2)
+
+    loss = MSELoss(model, y_data, weights)
+    assert loss(a=1.5, b=0.5, x=x) == pytest.approx(np.mean(expected**2))
+    squares = loss.squares(a=1.5, b=0.5, x=x)
+    assert np.allclose(np.concatenate([squares["y"], squares["z"]]), expected**2)
+
+    # reassigning y_data resets the flattened buffers
+    loss.y_data = {"y": y_model["y"], "z": y_model["z"]}
+    assert loss.from_outputs(y_model) == pytest.approx(0.0)
+
+    # residuals are written to a buffer per thread
+    from concurrent.futures import ThreadPoolExecutor
+
+    loss = SELoss(model, y_data, weights)
+    residuals = loss.residuals_and_loss(y_model)[0]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        other = executor.submit(lambda: loss.residuals_and_loss(model(a=2.0, b=0.0, x=x))[0])
+        assert other.result() is not residuals
+    assert np.allclose(residuals, expected)
@@ -1,6 +1,6 @@
 import sympy as sp
 import numpy as np
-from smitfit.parameter import Parameter, Parameters, unpack, pack
+from smitfit.parameter import PackingPlan, Parameter, Parameters, pack, scipy_bounds, unpack
 
 
 def test_parameter_initialization():
@@ -101,3 +101,53 @@ def test_pack():
     packed = pack(parameter_values)
 
     assert np.array_equal(packed, np.array([1, 2, 3, 4, 5, 6]))
+
+
+def test_packing_plan():
+    shapes = {"a": (), "b": (2, 3), "c": (2,)}
+    plan = PackingPlan(shapes)
+    assert len(plan) == 9
+
+    x = np.arange(9.0)
+    unpacked = plan.unpack(x)
+    expected = unpack(x, shapes)
+    for k in shapes:
+        assert unpacked[k].shape == shapes[k]
+        assert np.array_equal(unpacked[k], expected[k])
+        assert np.shares_memory(unpacked[k], x)
+
+    assert np.array_equal(plan.pack(unpacked), x)
+    assert np.array_equal(
+        plan.pack({"c": [7, 8], "b": np.ones((2, 3)), "a": 0}), pack([0, np.ones(6), [7, 8]])
+    )
+
+
+def test_element_fixed_mask():
+    params = Parameters(
+        [
+            Parameter("a", guess=np.array([1.0, 2.0, 3.0]), lower_bound=0.0),
+            Parameter("b", guess=5.0),
+        ]
+    )
+    params["a"].fix([True, False, False])
+    assert not params["a"].is_fixed
+    assert np.array_equal(params["a"].free_mask, [False, True, True])
+    assert [p.name for p in params.free] == ["a", "b"]
+    assert len(params.fixed) == 0
+
+    plan = PackingPlan.from_parameters(params.free)
+    assert len(plan) == 3
+    x = plan.pack(params.guess)
+    assert np.array_equal(x, [2.0, 3.0, 5.0])
+
+    unpacked = plan.unpack(np.array([20.0, 30.0, 50.0]))
+    assert np.array_equal(unpacked["a"], [1.0, 20.0, 30.0])
+    assert unpacked["b"] == 50.0
+    assert np.array_equal(plan.unpack(x, fill_value=0.0)["a"], [0.0, 2.0, 3.0])
+    assert np.array_equal(plan.free_index, [1, 2, 3])
+
+    bounds = scipy_bounds(params.free)
+    assert np.array_equal(bounds.lb, [0.0, 0.0, -np.inf])
+
+    params["a"].fix([True, True, True])
+    assert [p.name for p in params.fixed] == ["a"]